@@ -1,10 +1,15 @@
 import os
-from flask import Flask, render_template, request, jsonify, Response
-from find_similar_cards import LorcanaCardFinder, format_card_details
-import threading
 import time
+from flask import Flask, render_template, request, jsonify, Response, g
+from find_similar_cards import LorcanaCardFinder, format_card_details, FEATURES, WEIGHT_PRESETS
+import threading
 import logging
-from deck_generation_from_collection import parse_decklist, generate_final_deck, display_final_deck_comparison, load_collection
+from deck_generation_from_collection import parse_decklist, generate_final_deck, display_final_deck_comparison
+from collection_store import CollectionStore, UploadedCollections, DEFAULT_UPLOADS_PATH, full_collection
+from job_store import JobStore, JobRunner, JobQueueFull, DEFAULT_JOBS_PATH, FAILED
+from metrics import (MetricsRegistry, DEFAULT_METRICS_PATH, COUNTER, GAUGE, HISTOGRAM, LATENCY_BUCKETS,
+                     STAGE_BUCKETS)
+import csv
 import json
 
 app = Flask(__name__)
@@ -13,16 +18,73 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Initialize the finder in a background thread
+# Batch and deck analysis run as background jobs; their state lives in a store every worker can read
+job_store = JobStore(os.environ.get('SIMILCANA_JOBS_PATH', DEFAULT_JOBS_PATH))
+job_runner = JobRunner(job_store)
+
+# Open progress streams per process; gunicorn_config.py gives each worker only 4 threads
+progress_watchers = threading.BoundedSemaphore(int(os.environ.get('SIMILCANA_MAX_PROGRESS_WATCHERS', 2)))
+PROGRESS_IDLE_TIMEOUT = 30  # seconds without a change before a stream is closed
+PROGRESS_MAX_DURATION = 120  # seconds a single stream may stay open
+PROGRESS_RETRY_MS = 2000  # how long the browser waits before reconnecting a closed stream
+
+# Targets scored per matrix operation when batch results are streamed
+BATCH_STREAM_CHUNK_SIZE = 8
+
+# Parsed collection CSVs, shared by every request in this process
+collection_store = CollectionStore()
+# Collections uploaded by users, stored as count arrays every worker can read
+uploaded_collections = UploadedCollections(os.environ.get('SIMILCANA_COLLECTIONS_PATH', DEFAULT_UPLOADS_PATH))
+MAX_COLLECTION_UPLOAD_BYTES = 2 * 1024 * 1024
+
+# Prometheus metrics, merged across every worker through snapshot files in a shared directory
+metrics_registry = MetricsRegistry(os.environ.get('SIMILCANA_METRICS_PATH', DEFAULT_METRICS_PATH))
+metrics_registry.define('similcana_http_request_duration_seconds', HISTOGRAM,
+                        'Time until the response is returned, by route, method and status.', LATENCY_BUCKETS)
+metrics_registry.define('similcana_finder_stage_duration_seconds', HISTOGRAM,
+                        'Time spent in each stage of a similarity query.', STAGE_BUCKETS)
+metrics_registry.define('similcana_cache_hits_total', COUNTER, 'Cache hits by cache.')
+metrics_registry.define('similcana_cache_misses_total', COUNTER, 'Cache misses by cache.')
+metrics_registry.define('similcana_cache_hit_ratio', GAUGE, 'Hits over lookups by cache, across all workers.')
+metrics_registry.define('similcana_finder_ready', GAUGE, 'Whether the card finder is initialized.')
+metrics_registry.define('similcana_finder_init_seconds', GAUGE, 'How long the card finder took to initialize.')
+
+def observe_finder_stage(stage, seconds):
+    metrics_registry.observe('similcana_finder_stage_duration_seconds', seconds, stage=stage)
+
+# Initialize the finder
 finder = None
 def initialize_finder():
     global finder
     logger.debug("Initializing Finder")
-    finder = LorcanaCardFinder('database/allCards.json',recache_embeddings=True)
+    started = time.perf_counter()
+    new_finder = LorcanaCardFinder('database/allCards.json',recache_embeddings=True)
+    new_finder.stage_observer = observe_finder_stage
+    metrics_registry.set('similcana_finder_init_seconds', time.perf_counter() - started)
+    finder = new_finder
     logger.debug("DONE - Initializing Finder")
 
-init_thread = threading.Thread(target=initialize_finder)
-init_thread.start()
+def collect_finder_metrics(registry):
+    registry.set('similcana_finder_ready', 1 if finder is not None else 0)
+    if finder is None:
+        return
+    caches = {
+        'similarity_results': finder.result_cache.stats(),
+        'autocomplete': {'hits': finder.autocomplete_index.hits, 'misses': finder.autocomplete_index.misses}
+    }
+    for cache, stats in caches.items():
+        registry.set('similcana_cache_hits_total', stats['hits'], cache=cache)
+        registry.set('similcana_cache_misses_total', stats['misses'], cache=cache)
+
+metrics_registry.add_collector(collect_finder_metrics)
+
+if os.environ.get('SIMILCANA_PRELOAD') == '1':
+    # Preloaded by the gunicorn master (see gunicorn_config.py): build the finder synchronously
+    # so every forked worker shares it and is ready immediately
+    initialize_finder()
+else:
+    init_thread = threading.Thread(target=initialize_finder)
+    init_thread.start()
 
 def convert_similarity_values(similarities, overall_similarity):
     """Helper function to convert tensor values to Python floats"""
@@ -54,13 +116,71 @@ def convert_similarity_values(similarities, overall_similarity):
     
     return converted_similarities, overall_similarity
 
+class InvalidRequestOptions(ValueError):
+    """Malformed weights or filters in a request; answered with a 400."""
+
+def scoring_options(values):
+    """
+    Per-request weights and similarity function from form or JSON values. `weights` may be a
+    dict (or its JSON string) and `preset` a named weight preset; the finder validates both.
+    """
+    weights = values.get('weights') or values.get('preset') or None
+    if isinstance(weights, str) and weights.lstrip().startswith('{'):
+        try:
+            weights = json.loads(weights)
+        except ValueError:
+            raise InvalidRequestOptions("weights must be a JSON object") from None
+    similarity_function = values.get('similarity_function') or None
+    return weights, similarity_function
+
+def request_filters(values):
+    """Result filters (see LorcanaCardFinder.resolve_filters) from a dict or its JSON string, or None."""
+    filters = values.get('filters') or None
+    if isinstance(filters, str):
+        try:
+            filters = json.loads(filters)
+        except ValueError:
+            raise InvalidRequestOptions("filters must be a JSON object") from None
+    if filters is not None and not isinstance(filters, dict):
+        raise InvalidRequestOptions("filters must be a JSON object")
+    return filters
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    # Streamed responses (NDJSON, SSE) are timed until their first byte, not until they end
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics_registry.observe('similcana_http_request_duration_seconds', time.perf_counter() - started,
+                                 route=route, method=request.method, status=str(response.status_code))
+    return response
+
+@app.route('/metrics')
+def metrics():
+    merged = metrics_registry.collect()
+    # Ratios are derived from the merged totals, so they cover every worker
+    hits = merged['similcana_cache_hits_total']
+    misses = merged['similcana_cache_misses_total']
+    merged['similcana_cache_hit_ratio'] = {
+        key: count / (count + misses.get(key, 0)) if count + misses.get(key, 0) else 0.0
+        for key, count in hits.items()
+    }
+    return Response(metrics_registry.render(merged), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def home():
     return render_template('index.html')
 
 @app.route('/status')
 def status():
-    return jsonify({'ready': finder is not None})
+    return jsonify({
+        'ready': finder is not None,
+        'result_cache': finder.result_cache.stats() if finder is not None else None
+    })
 
 @app.route('/find_similar', methods=['POST'])
 def find_similar():
@@ -74,38 +194,46 @@ def find_similar():
         
         logger.debug(f"Searching for card: {card_name} with {result_count} results")
         
-        target_card, similar_cards = finder.find_similar_cards(card_name, num_results=result_count)
+        weights, similarity_function = scoring_options(request.form)
+        filters = request_filters(request.form)
+        
+        target_card, similar_cards = finder.find_similar_cards(card_name, num_results=result_count,
+                                                               weights=weights, similarity_function=similarity_function,
+                                                               filters=filters)
         
         if not target_card:
             return jsonify({'error': f"Card '{card_name}' not found"})
         
-        response = {
-            'target_card': {
-                'details': format_card_details(target_card),
-                'image_url': target_card.get('images', {}).get('full', ''),
-                'cardTraderUrl': target_card.get('externalLinks', {}).get('cardTraderUrl', '#')
-            },
-            'similar_cards': []
-        }
+        with metrics_registry.timer('similcana_finder_stage_duration_seconds', stage='serialization'):
+            response = {
+                'target_card': {
+                    'details': format_card_details(target_card),
+                    'image_url': target_card.get('images', {}).get('full', ''),
+                    'cardTraderUrl': target_card.get('externalLinks', {}).get('cardTraderUrl', '#')
+                },
+                'similar_cards': []
+            }
         
-        logger.debug(f"Found target card: {target_card.get('name')}")
+            logger.debug(f"Found target card: {target_card.get('name')}")
         
-        for card, similarities, overall_similarity in similar_cards:
-            logger.debug(f"Processing similar card: {card.get('name')}")
+            for card, similarities, overall_similarity in similar_cards:
+                logger.debug(f"Processing similar card: {card.get('name')}")
             
-            converted_similarities, overall_similarity = convert_similarity_values(similarities, overall_similarity)
+                converted_similarities, overall_similarity = convert_similarity_values(similarities, overall_similarity)
             
-            response['similar_cards'].append({
-                'details': format_card_details(card),
-                'image_url': card.get('images', {}).get('full', ''),
-                'similarities': converted_similarities,
-                'overall_similarity': overall_similarity,
-                'cardTraderUrl': card.get('externalLinks', {}).get('cardTraderUrl', '#')
-            })
+                response['similar_cards'].append({
+                    'details': format_card_details(card),
+                    'image_url': card.get('images', {}).get('full', ''),
+                    'similarities': converted_similarities,
+                    'overall_similarity': overall_similarity,
+                    'cardTraderUrl': card.get('externalLinks', {}).get('cardTraderUrl', '#')
+                })
         
-        logger.debug("Successfully prepared response")
-        return jsonify(response)
+            logger.debug("Successfully prepared response")
+            return jsonify(response)
         
+    except InvalidRequestOptions as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.exception("Error in find_similar route")
         return jsonify({'error': str(e)})
@@ -113,56 +241,140 @@ def find_similar():
 @app.route('/search_cards', methods=['POST'])
 def search_cards():
     logger.debug("search_cards route called")
+    if finder is None:
+        return jsonify([])
+    
     search_term = request.form.get('search_term', '').lower()
     if len(search_term) < 2:  # Only search if we have at least 2 characters
         return jsonify([])
     
-    # Search through cards and find matches
-    matches = []
-    for card in finder.cards:
-        card_name = card.get('simpleName', '').lower()
-        if search_term in card_name:
-            matches.append({
-                'name': card.get('fullName', ''),
-                'simpleName': card.get('simpleName', ''),
-                'image_url': card.get('images', {}).get('thumbnail', '')
-            })
-    
-    # Sort matches so that names starting with the search term come first
-    matches.sort(key=lambda x: (
-        not x['simpleName'].lower().startswith(search_term),
-        x['simpleName']
-    ))
-    
-    # Limit results to top 10
-    return jsonify(matches[:10])
+    # Ranked prefix, infix and typo-tolerant matches, limited to the top 10
+    return jsonify(finder.autocomplete_index.search(search_term, limit=10))
 
 @app.route('/update_weights', methods=['POST'])
 def update_weights():
-    new_weights = request.json
-    
-    # Validate weights sum to 1.0
-    if abs(sum(new_weights.values()) - 1.0) > 0.001:
-        return jsonify({'success': False, 'error': 'Weights must sum to 1.0'})
+    # Weights are sent with every search, so this only validates them; the shared finder is never modified
+    if finder is None:
+        return jsonify({'success': False, 'error': 'System is still initializing, please wait...'})
     
-    # Update weights in the finder
-    finder.weights = new_weights
-    return jsonify({'success': True})
+    try:
+        weights = finder.resolve_weights(request.json)
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'success': False, 'error': str(e)})
+    return jsonify({'success': True, 'weights': dict(zip(FEATURES, weights))})
+
+@app.route('/weight_presets')
+def weight_presets():
+    return jsonify(WEIGHT_PRESETS)
 
 @app.route('/batch')
 def batch():
     return render_template('batch.html')
 
+def job_progress_stream(job_id, kind):
+    """
+    SSE stream of one job's progress, read from the shared job store so any worker can serve it.
+    Events are pushed when the job changes rather than on a timer. Streams end when the job
+    finishes or goes idle, and only a few may be open per process so they can't take every
+    request thread; over the cap, the client gets one snapshot and reconnects after `retry`.
+    """
+    def event(job):
+        if job is None or job['kind'] != kind:
+            job = {'status': FAILED, 'error': 'Unknown job', 'current': 0, 'total': 0}
+        return f"retry: {PROGRESS_RETRY_MS}\ndata: {json.dumps(job)}\n\n"
+
+    def generate():
+        if not job_id:
+            yield event(None)
+            return
+        if not progress_watchers.acquire(blocking=False):
+            yield event(job_store.get(job_id, include_result=False))
+            return
+        try:
+            for job in job_store.watch(job_id, idle_timeout=PROGRESS_IDLE_TIMEOUT,
+                                       max_duration=PROGRESS_MAX_DURATION):
+                yield event(job)
+        finally:
+            progress_watchers.release()
+    return Response(generate(), mimetype='text/event-stream')
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = job_store.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
+
 @app.route('/batch_progress')
 def batch_progress():
+    return job_progress_stream(request.args.get('job_id'), 'batch')
+
+def batch_result_block(target_card, similar_cards):
+    """JSON-ready result block for one target card of a batch."""
+    result = {
+        'target_card': {
+            'details': format_card_details(target_card),
+            'image_url': target_card.get('images', {}).get('full', ''),
+            'cardTraderUrl': target_card.get('externalLinks', {}).get('cardTraderUrl', '#')
+        },
+        'similar_cards': []
+    }
+    
+    for card, similarities, overall_similarity in similar_cards:
+        converted_similarities, overall_similarity = convert_similarity_values(similarities, overall_similarity)
+        
+        result['similar_cards'].append({
+            'details': format_card_details(card),
+            'image_url': card.get('images', {}).get('full', ''),
+            'similarities': converted_similarities,
+            'overall_similarity': overall_similarity,
+            'cardTraderUrl': card.get('externalLinks', {}).get('cardTraderUrl', '#')
+        })
+    return result
+
+def run_batch_job(report, cards, result_count, weights, similarity_function, filters):
+    """Background job body for /find_similar_batch; returns the list of result blocks."""
+    logger.debug(f"Processing batch of {len(cards)} cards")
+    
+    # Every distinct card is scored in one matrix operation
+    batch_results = finder.find_similar_cards_batch(cards, num_results=result_count, weights=weights,
+                                                    similarity_function=similarity_function, filters=filters)
+    
+    results = []
+    for i, (target_card, similar_cards) in enumerate(batch_results):
+        if target_card:
+            with metrics_registry.timer('similcana_finder_stage_duration_seconds', stage='serialization'):
+                results.append(batch_result_block(target_card, similar_cards))
+        
+        # Update progress
+        report({'current': i + 1, 'total': len(batch_results)})
+    
+    logger.debug("Successfully prepared batch response")
+    return results
+
+def stream_batch_results(cards, result_count, weights, similarity_function, filters):
+    """
+    NDJSON stream of batch results: one {"result": ...} line per found card as soon as its
+    chunk is scored, then a closing {"done": true, "count": ...} line. Nothing is accumulated.
+    """
+    batch_results = finder.iter_similar_cards_batch(cards, num_results=result_count, weights=weights,
+                                                    similarity_function=similarity_function, filters=filters,
+                                                    chunk_size=BATCH_STREAM_CHUNK_SIZE)
+    
     def generate():
-        while True:
-            progress = getattr(app, 'batch_analysis_progress', {'current': 0, 'total': 0})
-            yield f"data: {json.dumps(progress)}\n\n"
-            if progress['current'] >= progress['total'] and progress['total'] > 0:
-                break
-            time.sleep(0.5)
-    return Response(generate(), mimetype='text/event-stream')
+        count = 0
+        try:
+            for target_card, similar_cards in batch_results:
+                if target_card:
+                    count += 1
+                    with metrics_registry.timer('similcana_finder_stage_duration_seconds', stage='serialization'):
+                        line = json.dumps({'result': batch_result_block(target_card, similar_cards)}) + '\n'
+                    yield line
+            yield json.dumps({'done': True, 'count': count}) + '\n'
+        except Exception as e:
+            logger.exception("Error while streaming batch results")
+            yield json.dumps({'error': str(e)}) + '\n'
+    return Response(generate(), mimetype='application/x-ndjson')
 
 @app.route('/find_similar_batch', methods=['POST'])
 def find_similar_batch():
@@ -174,48 +386,25 @@ def find_similar_batch():
         data = request.get_json()
         cards = data.get('cards', [])
         result_count = int(data.get('result_count', 5))
+        weights, similarity_function = scoring_options(data)
+        filters = request_filters(data)
         
-        logger.debug(f"Processing batch of {len(cards)} cards")
+        if data.get('stream'):
+            # Results are written to the response as they are computed instead of through a job
+            return stream_batch_results(cards, result_count, weights, similarity_function, filters)
         
-        # Initialize progress tracking
-        app.batch_analysis_progress = {'current': 0, 'total': len(cards)}
+        # Fail fast on bad options instead of inside the job
+        finder.resolve_weights(weights)
+        finder.resolve_similarity_function(similarity_function)
+        finder.resolve_filters(filters)
         
-        results = []
-        for i, card_name in enumerate(cards):
-            logger.debug(f"Processing card: {card_name}")
-            
-            target_card, similar_cards = finder.find_similar_cards(card_name, num_results=result_count)
-            if target_card:
-                result = {
-                    'target_card': {
-                        'details': format_card_details(target_card),
-                        'image_url': target_card.get('images', {}).get('full', ''),
-                        'cardTraderUrl': target_card.get('externalLinks', {}).get('cardTraderUrl', '#')
-                    },
-                    'similar_cards': []
-                }
-                
-                for card, similarities, overall_similarity in similar_cards:
-                    converted_similarities, overall_similarity = convert_similarity_values(similarities, overall_similarity)
-                    
-                    result['similar_cards'].append({
-                        'details': format_card_details(card),
-                        'image_url': card.get('images', {}).get('full', ''),
-                        'similarities': converted_similarities,
-                        'overall_similarity': overall_similarity,
-                        'cardTraderUrl': card.get('externalLinks', {}).get('cardTraderUrl', '#')
-                    })
-                results.append(result)
-            
-            # Update progress
-            app.batch_analysis_progress = {'current': i + 1, 'total': len(cards)}
-        
-        # Reset progress
-        app.batch_analysis_progress = {'current': 0, 'total': 0}
-        
-        logger.debug("Successfully prepared batch response")
-        return jsonify(results)
+        # Progress counts distinct cards, like the results do
+        job_id = job_runner.submit('batch', run_batch_job, cards, result_count, weights, similarity_function,
+                                   filters, total=len(finder.distinct_card_indices(cards)))
+        return jsonify({'job_id': job_id})
         
+    except InvalidRequestOptions as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.exception("Error in find_similar_batch route")
         return jsonify({'error': str(e)})
@@ -226,48 +415,15 @@ def deck_comparison():
 
 @app.route('/deck_progress')
 def deck_progress():
-    def generate():
-        while True:
-            progress = getattr(app, 'deck_analysis_progress', {'current': 0, 'total': 0})
-            yield f"data: {json.dumps(progress)}\n\n"
-            if progress['current'] >= progress['total'] and progress['total'] > 0:
-                break
-            time.sleep(0.5)
-    return Response(generate(), mimetype='text/event-stream')
-
-@app.route('/analyze_deck', methods=['POST'])
-def analyze_deck():
-    if finder is None:
-        return jsonify({'error': 'System is still initializing, please wait...'})
-    
-    data = request.get_json()
-    decklist_text = data.get('decklist', '')
-    ignore_collection = data.get('ignoreCollection', True)
+    return job_progress_stream(request.args.get('job_id'), 'deck')
 
-    # Parse decklist first so we know which cards to exclude
-    decklist = parse_decklist(decklist_text)
-    
-    # Initialize progress tracking
-    app.deck_analysis_progress = {'current': 0, 'total': len(decklist)}
-
-    # Load collection only if we're not ignoring it
-    collection = None
-    if not ignore_collection:
-        collection = load_collection('database/export.csv')
-    else:
-        collection = {}
-        for card in finder.cards:
-            card_name = card['simpleName'].lower()
-            if card_name not in decklist:
-                collection[card_name] = 4
-            else:
-                collection[card_name] = 0
+def run_deck_job(report, decklist, collection, weights, similarity_function, optimize):
+    """Background job body for /analyze_deck; returns the comparison HTML and the final deck."""
 
     # Generate final decklist and log replacements
-    final_deck, replacement_log = generate_final_deck(decklist, collection, finder, progress_callback=lambda x: setattr(app, 'deck_analysis_progress', x))
-
-    # Reset progress
-    app.deck_analysis_progress = {'current': 0, 'total': 0}
+    final_deck, replacement_log = generate_final_deck(decklist, collection, finder, progress_callback=report,
+                                                      weights=weights, similarity_function=similarity_function,
+                                                      optimize=optimize)
 
     # Prepare HTML for the results
     html_output = generate_deck_comparison_html(decklist, final_deck, replacement_log)
@@ -297,9 +453,82 @@ def analyze_deck():
                     'image_url': get_image_url(card_name)
                 }
 
-    return jsonify({
+    return {
         'html': html_output,
         'final_deck': list(combined_final_deck.values())
+    }
+
+@app.route('/analyze_deck', methods=['POST'])
+def analyze_deck():
+    if finder is None:
+        return jsonify({'error': 'System is still initializing, please wait...'})
+    
+    data = request.get_json()
+    decklist_text = data.get('decklist', '')
+    ignore_collection = data.get('ignoreCollection', True)
+    optimize = bool(data.get('optimize', False))
+    try:
+        weights, similarity_function = scoring_options(data)
+        # Fail fast on bad options instead of inside the job
+        finder.resolve_weights(weights)
+        finder.resolve_similarity_function(similarity_function)
+    except InvalidRequestOptions as e:
+        return jsonify({'error': str(e)}), 400
+    except (ValueError, TypeError, AttributeError) as e:
+        return jsonify({'error': str(e)})
+
+    # Parse decklist first so we know which cards to exclude
+    decklist = parse_decklist(decklist_text)
+
+    # Collections are count vectors aligned with finder.cards; CSVs are never parsed per request
+    collection_id = data.get('collection_id')
+    if ignore_collection:
+        collection = full_collection(finder, excluded_names=decklist)
+    elif collection_id:
+        collection = uploaded_collections.get(collection_id, finder)
+        if collection is None:
+            return jsonify({'error': 'Unknown or expired collection, please upload it again'})
+    else:
+        try:
+            collection = collection_store.load('database/export.csv', finder)
+        except OSError:
+            logger.exception("Error loading the server collection")
+            return jsonify({'error': 'No collection available, please upload yours'})
+
+    try:
+        job_id = job_runner.submit('deck', run_deck_job, decklist, collection, weights, similarity_function,
+                                   optimize, total=sum(decklist.values()))
+    except JobQueueFull as e:
+        return jsonify({'error': str(e)})
+    return jsonify({'job_id': job_id})
+
+@app.route('/upload_collection', methods=['POST'])
+def upload_collection():
+    """Store a dreamborn.ink CSV export (file field 'collection' or raw body) and return its ID."""
+    if finder is None:
+        return jsonify({'error': 'System is still initializing, please wait...'})
+    if request.content_length and request.content_length > MAX_COLLECTION_UPLOAD_BYTES:
+        return jsonify({'error': 'Collection file is too large'})
+    
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('collection')
+        if not upload:
+            return jsonify({'error': 'No collection file was uploaded'})
+        raw = upload.read(MAX_COLLECTION_UPLOAD_BYTES + 1)
+    else:
+        raw = request.get_data(cache=False)
+    if len(raw) > MAX_COLLECTION_UPLOAD_BYTES:
+        return jsonify({'error': 'Collection file is too large'})
+    
+    try:
+        collection_id, counts = uploaded_collections.add(raw.decode('utf-8', errors='replace'), finder)
+    except (ValueError, KeyError, csv.Error) as e:
+        return jsonify({'error': f"Could not read the collection: {e}"})
+    
+    return jsonify({
+        'collection_id': collection_id,
+        'cards': int((counts > 0).sum()),
+        'copies': int(counts.sum())
     })
 
 def generate_deck_comparison_html(original_decklist, final_deck, replacement_log):
@@ -383,17 +612,17 @@ def generate_deck_comparison_html(original_decklist, final_deck, replacement_log
 
 def get_image_url(card_name):
     """Helper function to retrieve the image URL for a given card name."""
-    for card in finder.cards:
-        if card.get('simpleName', '').lower() == card_name.lower():
-            return card.get('images', {}).get('full', '')  # Adjust the key as necessary
-    return ''  # Return an empty string if the card is not found
+    card = finder.find_card_by_name(card_name)
+    if card is None:
+        return ''  # Return an empty string if the card is not found
+    return card.get('images', {}).get('full', '')
 
 def get_full_name(card_name):
     """Helper function to retrieve the full name for a given card name."""
-    for card in finder.cards:
-        if card.get('simpleName', '').lower() == card_name.lower():
-            return card.get('fullName', '')  # Adjust the key as necessary
-    return card_name  # Return the simple name if the full name is not found
+    card = finder.find_card_by_name(card_name)
+    if card is None:
+        return card_name  # Return the simple name if the full name is not found
+    return card.get('fullName', '')
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 10000))  # Render uses PORT env variable
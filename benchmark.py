@@ -0,0 +1,302 @@
+"""
+Offline benchmark suite for the card finder, deck generation and name search.
+
+Usage:
+    python benchmark.py --output benchmark_baseline.json
+    python benchmark.py --baseline benchmark_baseline.json --tolerance 0.25
+
+Runs against the bundled database/allCards_before_set8.json and database/export.csv. The
+snapshot and similarity matrices are written to a temporary directory, so both a cold and a
+warm finder construction are measured and the app's own files are never touched. Embeddings
+are read from the embeddings cache; the model is only loaded (from the local Hugging Face
+cache, never downloaded) if some ability text isn't cached yet.
+
+Results are printed (or written with --output) as JSON: one entry per benchmark with the
+run count and min/median/mean/p95/max in milliseconds. With --baseline, medians are compared
+against a previous results file and the exit code is 1 if any benchmark got slower than the
+tolerance allows. Cold construction depends heavily on disk and page cache state, so it is
+compared and reported but never affects the exit code.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import contextlib
+
+# Benchmarks must never reach the network
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+
+import numpy as np
+
+DEFAULT_CARDS_PATH = 'database/allCards_before_set8.json'
+DEFAULT_COLLECTION_PATH = 'database/export.csv'
+
+# Amethyst/Sapphire list used by the deck benchmarks
+BENCHMARK_DECKLIST = """
+4 Elsa - Spirit of Winter
+4 Friends on the Other Side
+4 Magic Broom - Bucket Brigade
+4 Ursula - Power Hungry
+4 Arthur - Wizard's Apprentice
+4 Madam Mim - Purple Dragon
+4 Magic Carpet - Flying Rug
+4 Elsa - Storm Chaser
+4 Fishbone Quill
+4 Develop Your Brain
+4 Belle - Strange but Special
+4 Hiram Flaversham - Toymaker
+4 Heart of Te Fiti
+4 Vision of the Future
+4 Sisu - Divine Water Dragon
+"""
+
+# Name prefixes, word prefixes, infixes and typos, like the typeahead sees them
+SEARCH_TERMS = ['mic', 'mickey mouse', 'brave', 'legs', 'stich', 'elsa spirit', 'hunny', 'te fiti', 'fishbon',
+                'mauii', 'the', 'sorcerer']
+
+# Reported and compared, but too dependent on I/O to fail a run
+UNGATED_BENCHMARKS = ('construction_cold',)
+
+
+def summarize(durations):
+    """Timing statistics in milliseconds for a list of durations in seconds."""
+    values = np.array(durations) * 1000
+    return {
+        'runs': len(values),
+        'min_ms': float(values.min()),
+        'median_ms': float(np.median(values)),
+        'mean_ms': float(values.mean()),
+        'p95_ms': float(np.percentile(values, 95)),
+        'max_ms': float(values.max())
+    }
+
+
+def measure(func, repeat, setup=None):
+    """Call `func()` `repeat` times (after an optional untimed `setup()` each time) and summarize."""
+    durations = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
+
+
+class BenchmarkSuite:
+    """Runs every benchmark against one dataset and collects the results by name."""
+
+    def __init__(self, cards_path=DEFAULT_CARDS_PATH, collection_path=DEFAULT_COLLECTION_PATH,
+                 embeddings_cache_path='embeddings_cache', repeat=10):
+        self.cards_path = cards_path
+        self.collection_path = collection_path
+        self.embeddings_cache_path = embeddings_cache_path
+        self.repeat = repeat
+        self.results = {}
+        self.finder = None
+
+    def run(self):
+        """Run all benchmarks and return the results dict."""
+        work_dir = tempfile.mkdtemp(prefix='similcana_benchmark_')
+        try:
+            self._bench_construction(work_dir)
+            self._bench_find_similar_cards()
+            self._bench_batch()
+            self._bench_deck_generation()
+            self._bench_find_mechanics()
+            self._bench_name_search()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return self.results
+
+    def _new_finder(self, work_dir):
+        from find_similar_cards import LorcanaCardFinder
+        return LorcanaCardFinder(self.cards_path, embeddings_cache_path=self.embeddings_cache_path,
+                                 similarity_matrices_path=os.path.join(work_dir, 'similarity_matrices.npy'),
+                                 snapshot_path=os.path.join(work_dir, 'finder_snapshot.pkl'))
+
+    def _bench_construction(self, work_dir):
+        runs = max(min(self.repeat, 3), 1)
+        # Cold: card JSON parsed, features and similarity matrices built from scratch, each time in
+        # a fresh directory. Only the first build may have to encode embeddings missing from the cache.
+        durations = []
+        embeddings_encoded = None
+        for _ in range(runs):
+            cold_dir = tempfile.mkdtemp(dir=work_dir)
+            start = time.perf_counter()
+            self.finder = self._new_finder(cold_dir)
+            durations.append(time.perf_counter() - start)
+            if embeddings_encoded is None:
+                embeddings_encoded = self.finder.embeddings_encoded
+        self.results['construction_cold'] = dict(summarize(durations), embeddings_encoded=embeddings_encoded)
+        # Warm: snapshot loaded and matrices memory-mapped from the last cold build's files
+        self.results['construction_warm'] = measure(lambda: self._new_finder(cold_dir), runs)
+
+    def _sample_names(self, count=20):
+        step = max(len(self.finder.cards) // count, 1)
+        return [card['fullName'] for card in self.finder.cards[::step][:count]]
+
+    def _bench_find_similar_cards(self):
+        names = self._sample_names()
+        finder = self.finder
+
+        def find_all(num_results=10):
+            for name in names:
+                finder.find_similar_cards(name, num_results)
+
+        self.results['find_similar_cards'] = dict(measure(find_all, self.repeat, setup=finder.result_cache.clear),
+                                                  items=len(names))
+        self.results['find_similar_cards_50'] = dict(
+            measure(lambda: find_all(50), self.repeat, setup=finder.result_cache.clear), items=len(names)
+        )
+        find_all()
+        self.results['find_similar_cards_cached'] = dict(measure(find_all, self.repeat), items=len(names))
+
+    def _bench_batch(self):
+        from deck_generation_from_collection import parse_decklist
+        names = list(parse_decklist(BENCHMARK_DECKLIST))
+        finder = self.finder
+        self.results['find_similar_cards_batch'] = dict(
+            measure(lambda: finder.find_similar_cards_batch(names, 10), self.repeat, setup=finder.result_cache.clear),
+            items=len(names)
+        )
+
+    def _bench_deck_generation(self):
+        from deck_generation_from_collection import parse_decklist, load_collection, generate_final_deck
+        decklist = parse_decklist(BENCHMARK_DECKLIST)
+        collection = load_collection(self.collection_path)
+        finder = self.finder
+        # Untimed first runs, so one-off imports (scipy for the optimal builder) don't skew the medians
+        generate_final_deck(decklist, collection, finder)
+        generate_final_deck(decklist, collection, finder, optimize=True)
+
+        self.results['generate_final_deck'] = measure(
+            lambda: generate_final_deck(decklist, collection, finder), self.repeat
+        )
+        self.results['generate_final_deck_optimal'] = measure(
+            lambda: generate_final_deck(decklist, collection, finder, optimize=True), self.repeat
+        )
+
+    def _bench_find_mechanics(self):
+        cards = self.finder.cards
+        finder = self.finder
+        self.results['find_mechanics'] = dict(
+            measure(lambda: [finder._find_mechanics(card) for card in cards], self.repeat), items=len(cards)
+        )
+
+    def _bench_name_search(self):
+        from card_index import AutocompleteIndex
+        finder = self.finder
+        # A zero-sized cache makes every search a miss
+        uncached_index = AutocompleteIndex(finder.cards, cache_size=0)
+        self.results['name_search'] = dict(
+            measure(lambda: [uncached_index.search(term) for term in SEARCH_TERMS], self.repeat),
+            items=len(SEARCH_TERMS)
+        )
+
+        names = [card['fullName'] for card in finder.cards]
+        self.results['name_lookup'] = dict(
+            measure(lambda: [finder.find_card_index(name.lower()) for name in names], self.repeat), items=len(names)
+        )
+
+
+def compare(results, baseline, tolerance=0.25, min_delta_ms=0.5):
+    """
+    Compare median timings against a baseline's. A benchmark regressed if its median grew by
+    more than `tolerance` (a fraction) and by at least `min_delta_ms`, which keeps timer noise
+    on sub-millisecond benchmarks from failing the run.
+    """
+    comparison = {}
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            comparison[name] = {'status': 'new', 'current_ms': current['median_ms']}
+            continue
+
+        ratio = current['median_ms'] / previous['median_ms'] if previous['median_ms'] else float('inf')
+        delta = current['median_ms'] - previous['median_ms']
+        if ratio > 1 + tolerance and delta >= min_delta_ms:
+            status = 'regressed'
+        elif ratio < 1 / (1 + tolerance) and -delta >= min_delta_ms:
+            status = 'improved'
+        else:
+            status = 'unchanged'
+        comparison[name] = {
+            'status': status,
+            'baseline_ms': previous['median_ms'],
+            'current_ms': current['median_ms'],
+            'ratio': ratio
+        }
+    for name in baseline:
+        if name not in results:
+            comparison[name] = {'status': 'missing', 'baseline_ms': baseline[name]['median_ms']}
+    return comparison
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the card finder offline and optionally compare to a baseline.")
+    parser.add_argument('--cards', default=DEFAULT_CARDS_PATH)
+    parser.add_argument('--collection', default=DEFAULT_COLLECTION_PATH)
+    parser.add_argument('--embeddings-cache', default='embeddings_cache')
+    parser.add_argument('--repeat', type=int, default=10, help="Timed runs per benchmark")
+    parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+    parser.add_argument('--baseline', help="Results file from a previous run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown of a median before it counts as a regression (0.25 = 25%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help="Slowdowns smaller than this many milliseconds never count as regressions")
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite(args.cards, args.collection, args.embeddings_cache, repeat=args.repeat)
+    # The finder's progress messages would mix with the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        results = suite.run()
+
+    report = {
+        'environment': environment_info(),
+        'dataset': {'cards_path': args.cards, 'cards': len(suite.finder.cards), 'collection_path': args.collection},
+        'repeat': args.repeat,
+        'results': results
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['baseline'] = args.baseline
+        report['comparison'] = compare(results, baseline.get('results', {}), tolerance=args.tolerance,
+                                       min_delta_ms=args.min_delta_ms)
+        regressions = [name for name, entry in report['comparison'].items()
+                       if entry['status'] == 'regressed' and name not in UNGATED_BENCHMARKS]
+        report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    for name in regressions:
+        entry = report['comparison'][name]
+        print(f"REGRESSION {name}: {entry['baseline_ms']:.3f}ms -> {entry['current_ms']:.3f}ms "
+              f"({entry['ratio']:.2f}x)", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
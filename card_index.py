@@ -0,0 +1,173 @@
+import bisect
+import threading
+import unicodedata
+from collections import OrderedDict, Counter, defaultdict
+
+
+def sanitize_string(input_string):
+    # Remove all special characters except hyphens in words
+    sanitized = input_string.replace('!', '').replace(' - ', ' ').replace('.','')
+    sanitized = " ".join(sanitized.lower().strip().split())
+
+    return sanitized
+
+def loose_name(input_string):
+    """Looser normalization for names typed or exported by other tools (accents, punctuation, quotes)."""
+    folded = unicodedata.normalize('NFKD', input_string)
+    folded = ''.join(char for char in folded if not unicodedata.combining(char))
+    folded = folded.replace('’', "'").replace('‘', "'")
+    for char in '?!.,"“”':
+        folded = folded.replace(char, ' ')
+    return sanitize_string(folded)
+
+
+class CardNameIndex:
+    """
+    Canonical name index mapping card names to their position in the finder's card list.
+
+    Sanitized simpleNames are indexed first, so they always win over looser variants
+    (fullName, accent-folded and punctuation-free spellings) of another card. When several
+    cards share a key, the first one in the card list wins, like the old linear scans.
+    """
+
+    def __init__(self, cards):
+        self._primary = {}
+        self._variants = {}
+
+        for idx, card in enumerate(cards):
+            self._primary.setdefault(sanitize_string(card.get('simpleName', '')), idx)
+
+        for idx, card in enumerate(cards):
+            simple_name = card.get('simpleName', '')
+            full_name = card.get('fullName', '')
+            for key in (loose_name(simple_name), full_name.lower(), loose_name(full_name)):
+                if key:
+                    self._variants.setdefault(key, idx)
+
+    def lookup(self, name):
+        """Return the card index for a name, or None if it is unknown."""
+        if not name:
+            return None
+        idx = self._primary.get(sanitize_string(name))
+        if idx is None:
+            idx = self._variants.get(name.lower(), self._variants.get(loose_name(name)))
+        return idx
+
+    def __contains__(self, name):
+        return self.lookup(name) is not None
+
+
+def trigrams(text):
+    """Set of character trigrams of a string."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class AutocompleteIndex:
+    """
+    Ranked typeahead over card names.
+
+    Matches are ranked in tiers: name prefix, then word prefix (e.g. "legs" for
+    "ariel on human legs"), then infix, then typo-tolerant trigram matches; ties are
+    broken alphabetically. Prefix lookups bisect a sorted array of every word-start
+    suffix of every name, infix and fuzzy lookups go through a trigram index, and
+    finished result lists are kept in a bounded LRU cache shared by all request threads.
+    """
+
+    def __init__(self, cards, cache_size=1024, min_fuzzy_overlap=0.5):
+        self.cache_size = cache_size
+        self.min_fuzzy_overlap = min_fuzzy_overlap
+        self._names = [sanitize_string(card.get('simpleName', '')) for card in cards]
+        self._entries = [{
+            'name': card.get('fullName', ''),
+            'simpleName': card.get('simpleName', ''),
+            'image_url': card.get('images', {}).get('thumbnail', '')
+        } for card in cards]
+
+        suffixes = []
+        self._trigrams = defaultdict(set)
+        for idx, name in enumerate(self._names):
+            start = 0
+            for word in name.split(' '):
+                suffixes.append((name[start:], idx, start))
+                start += len(word) + 1
+            for trigram in trigrams(name):
+                self._trigrams[trigram].add(idx)
+        suffixes.sort()
+        self._suffix_keys = [suffix for suffix, _, _ in suffixes]
+        self._suffix_entries = [(idx, start) for _, idx, start in suffixes]
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # Locks can't be pickled and cached results are cheap to recompute
+        state = self.__dict__.copy()
+        del state['_cache_lock']
+        state['_cache'] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache_lock = threading.Lock()
+
+    def search(self, term, limit=10):
+        """Return up to `limit` ranked matches as dicts with name, simpleName and image_url."""
+        query = loose_name(term)
+        if len(query) < 2:
+            return []
+
+        cache_key = (query, limit)
+        with self._cache_lock:
+            results = self._cache.get(cache_key)
+            if results is not None:
+                self._cache.move_to_end(cache_key)
+                self.hits += 1
+                return results
+            self.misses += 1
+
+        results = [self._entries[idx] for idx in self._rank(query, limit)]
+
+        with self._cache_lock:
+            self._cache[cache_key] = results
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return results
+
+    def _rank(self, query, limit):
+        """Indices of the best matches for a normalized query, best first."""
+        ranks = {}
+
+        # Tier 0/1: name prefix or word prefix, via the sorted suffix array
+        lo = bisect.bisect_left(self._suffix_keys, query)
+        hi = bisect.bisect_left(self._suffix_keys, query + '\uffff')
+        for idx, start in self._suffix_entries[lo:hi]:
+            tier = 0 if start == 0 else 1
+            if idx not in ranks or ranks[idx][0] > tier:
+                ranks[idx] = (tier, 0.0)
+
+        query_trigrams = trigrams(query)
+
+        # Tier 2: infix anywhere in the name
+        if len(ranks) < limit:
+            if query_trigrams:
+                candidates = set.intersection(*(self._trigrams.get(t, set()) for t in query_trigrams))
+            else:
+                candidates = range(len(self._names))
+            for idx in candidates:
+                if idx not in ranks and query in self._names[idx]:
+                    ranks[idx] = (2, 0.0)
+
+        # Tier 3: typo-tolerant matches sharing most of the query's trigrams
+        if len(ranks) < limit and query_trigrams:
+            overlap = Counter()
+            for trigram in query_trigrams:
+                overlap.update(self._trigrams.get(trigram, ()))
+            for idx, shared in overlap.items():
+                score = shared / len(query_trigrams)
+                if idx not in ranks and score >= self.min_fuzzy_overlap:
+                    ranks[idx] = (3, -score)
+
+        ranked = sorted(ranks, key=lambda idx: (ranks[idx], self._names[idx]))
+        return ranked[:limit]
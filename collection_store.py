@@ -0,0 +1,190 @@
+import io
+import os
+import re
+import csv
+import time
+import uuid
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+from card_index import sanitize_string
+
+
+# Shared by every gunicorn worker on the machine, so an upload handled by one worker is usable by all
+DEFAULT_UPLOADS_PATH = os.path.join(tempfile.gettempdir(), 'similcana_collections')
+
+
+def parse_collection_csv(lines):
+    """Parse dreamborn.ink export lines into {sanitized name: Normal + Foil copies}, skipping cards with no copies."""
+    collection = {}
+    for row in csv.DictReader(lines):
+        if not row.get('Name'):
+            continue
+        total_copies = int(row.get('Normal') or 0) + int(row.get('Foil') or 0)
+        if total_copies > 0:
+            collection[sanitize_string(row['Name'])] = total_copies
+    return collection
+
+
+def read_collection_csv(csv_path):
+    """Parse a dreamborn.ink export file; see parse_collection_csv."""
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        return parse_collection_csv(f)
+
+
+def collection_vector(collection, finder):
+    """
+    Turn a {card name: copies} dict into an integer count vector aligned with finder.cards.
+    Counts sit at each name's canonical index (see LorcanaCardFinder.canonical_indices);
+    names the finder doesn't know are ignored.
+    """
+    counts = np.zeros(len(finder.cards), dtype=np.int32)
+    for name, copies in collection.items():
+        idx = finder.find_card_index(name)
+        if idx is not None:
+            counts[finder.canonical_indices[idx]] += copies
+    return counts
+
+
+def full_collection(finder, excluded_names=(), copies=4):
+    """Count vector owning `copies` of every card except the excluded ones (the 'ignore collection' mode)."""
+    counts = np.full(len(finder.cards), copies, dtype=np.int32)
+    for name in excluded_names:
+        idx = finder.find_card_index(name)
+        if idx is not None:
+            counts[finder.canonical_indices[idx]] = 0
+    return counts
+
+
+class CollectionStore:
+    """
+    Collection CSVs parsed once and kept as read-only count vectors.
+
+    Entries are keyed on the file path and revalidated against the file's mtime and size,
+    so an edited export is reparsed on the next request while unchanged ones cost one stat.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def load(self, csv_path, finder):
+        """Return the count vector for a collection CSV, parsing it only if it changed."""
+        stat = os.stat(csv_path)
+        version = (stat.st_mtime_ns, stat.st_size, finder.dataset_version)
+        with self._lock:
+            entry = self._entries.get(csv_path)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+        counts = collection_vector(read_collection_csv(csv_path), finder)
+        counts.setflags(write=False)
+        with self._lock:
+            self._entries[csv_path] = (version, counts)
+        return counts
+
+
+class UploadedCollections:
+    """
+    User-uploaded collections stored under random IDs as compact count arrays.
+
+    Each upload is resolved against the card index once and written to `<id>.npz` (uint16
+    counts plus the finder's dataset version) in a directory all workers share. Reads are
+    served from a small in-process LRU. Files unused for `max_age` seconds are evicted, and
+    beyond `max_entries` the least recently used ones go first.
+    """
+
+    ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+    def __init__(self, directory=DEFAULT_UPLOADS_PATH, max_entries=256, max_age=7 * 24 * 3600, memory_entries=32):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, collection_id):
+        return os.path.join(self.directory, f"{collection_id}.npz")
+
+    def add(self, csv_text, finder):
+        """Parse and store an uploaded export. Returns (collection ID, count vector)."""
+        collection = parse_collection_csv(io.StringIO(csv_text.lstrip('\ufeff')))
+        counts = collection_vector(collection, finder)
+        if not counts.any():
+            raise ValueError("No known cards with copies were found in the uploaded collection")
+
+        collection_id = uuid.uuid4().hex
+        tmp_path = self._path(collection_id) + '.tmp.npz'
+        np.savez_compressed(tmp_path, counts=np.minimum(counts, np.iinfo(np.uint16).max).astype(np.uint16),
+                            dataset_version=np.array(finder.dataset_version))
+        os.replace(tmp_path, self._path(collection_id))
+        self._remember(collection_id, finder.dataset_version, counts)
+        self._evict()
+        return collection_id, counts
+
+    def get(self, collection_id, finder):
+        """Return the read-only count vector for an ID, or None if it is unknown, expired or stale."""
+        if not collection_id or not self.ID_PATTERN.match(collection_id):
+            return None
+
+        with self._lock:
+            entry = self._memory.get(collection_id)
+            if entry is not None:
+                self._memory.move_to_end(collection_id)
+        if entry is not None and entry[0] == finder.dataset_version:
+            self._touch(collection_id)
+            return entry[1]
+
+        try:
+            with np.load(self._path(collection_id)) as data:
+                dataset_version = str(data['dataset_version'])
+                counts = data['counts'].astype(np.int32)
+        except (OSError, KeyError, ValueError):
+            return None
+        # Counts are aligned with the card list they were resolved against
+        if dataset_version != finder.dataset_version or len(counts) != len(finder.cards):
+            return None
+
+        self._touch(collection_id)
+        return self._remember(collection_id, dataset_version, counts)
+
+    def _remember(self, collection_id, dataset_version, counts):
+        counts.setflags(write=False)
+        with self._lock:
+            self._memory[collection_id] = (dataset_version, counts)
+            self._memory.move_to_end(collection_id)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+        return counts
+
+    def _touch(self, collection_id):
+        # The file's mtime doubles as its last-used time for eviction
+        try:
+            os.utime(self._path(collection_id))
+        except OSError:
+            pass
+
+    def _evict(self):
+        """Drop expired uploads, then the least recently used ones beyond max_entries."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz') or name.endswith('.tmp.npz'):
+                continue
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+            except OSError:
+                continue
+        entries.sort(reverse=True)
+
+        now = time.time()
+        for position, (mtime, name) in enumerate(entries):
+            if position >= self.max_entries or now - mtime > self.max_age:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+                with self._lock:
+                    self._memory.pop(name[:-len('.npz')], None)
@@ -0,0 +1,96 @@
+import numpy as np
+
+
+def word_similarity(word1, word2):
+    """
+    Calculate similarity between two words using character-level comparison.
+    Returns a score between 0 and 1.
+    """
+    # Convert to sets of characters for comparison
+    set1, set2 = set(word1), set(word2)
+
+    # Calculate Jaccard similarity
+    intersection = len(set1 & set2)
+    union = len(set1 | set2)
+
+    return intersection / union if union > 0 else 0.0
+
+
+class ConceptMatcher:
+    """
+    Indexed fuzzy matcher for ability concepts.
+
+    A phrase matches a text when some window of text words is close enough to the phrase
+    words (character-set Jaccard above the threshold), exactly like the original
+    word-by-word scan. Instead of comparing every window against every phrase, each
+    distinct text word is compared once against the phrase words it could possibly match
+    (Jaccard can only exceed the threshold when the character-set sizes are close), and
+    the result is cached. Scoring a text then reduces to set lookups.
+    """
+
+    def __init__(self, concepts, threshold=0.85):
+        self.concepts = concepts
+        self.concept_names = list(concepts)
+        self.threshold = threshold
+        self._phrase_words = sorted({word for data in concepts.values()
+                                     for phrase in data["phrases"] for word in phrase.split()})
+        self._phrase_charsets = [(word, set(word)) for word in self._phrase_words]
+        self._word_matches = {}
+
+    def _matching_phrase_words(self, word):
+        """Phrase words the given text word is similar enough to, cached per distinct word."""
+        matches = self._word_matches.get(word)
+        if matches is None:
+            charset = set(word)
+            size = len(charset)
+            matches = frozenset(
+                phrase_word for phrase_word, phrase_charset in self._phrase_charsets
+                if min(size, len(phrase_charset)) > self.threshold * max(size, len(phrase_charset))
+                and word_similarity(word, phrase_word) > self.threshold
+            )
+            self._word_matches[word] = matches
+        return matches
+
+    def phrase_matches(self, text_words, word_matches, phrase):
+        """Check if phrase appears in the (lowercased, split) text using fuzzy matching."""
+        phrase_words = phrase.split()
+
+        for i in range(len(text_words) - len(phrase_words) + 1):
+            matches = sum(1 for word, phrase_word in zip(word_matches[i:i + len(phrase_words)], phrase_words)
+                          if phrase_word in word)
+
+            if matches / len(phrase_words) > self.threshold:
+                return True
+
+        return False
+
+    def concept_scores(self, text):
+        """Score of the text for every concept, in concept order."""
+        text_words = text.lower().split()
+        word_matches = [self._matching_phrase_words(word) for word in text_words]
+        matched_phrase_words = frozenset().union(*word_matches)
+
+        scores = []
+        for name in self.concept_names:
+            data = self.concepts[name]
+            matches = 0
+            for phrase in data["phrases"]:
+                phrase_words = phrase.split()
+                # Phrases short enough to need every word can be ruled out without scanning windows
+                if len(phrase_words) * (1 - self.threshold) <= 1 and not matched_phrase_words.issuperset(phrase_words):
+                    continue
+                if self.phrase_matches(text_words, word_matches, phrase):
+                    matches += 1
+
+            # Calculate score based on matches and weight
+            match_ratio = matches / len(data["phrases"])
+            scores.append(min(1.0, match_ratio) * data["weight"])
+        return scores
+
+    def concept_vectors(self, texts):
+        """Stack concept scores for many texts into a (len(texts), len(concepts)) array."""
+        vectors = np.zeros((len(texts), len(self.concept_names)), dtype=np.float64)
+        for row, text in enumerate(texts):
+            if text.strip():
+                vectors[row] = self.concept_scores(text)
+        return vectors
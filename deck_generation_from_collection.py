@@ -1,16 +1,15 @@
-import pandas as pd
+import numpy as np
 from find_similar_cards import LorcanaCardFinder, sanitize_string
+from collection_store import read_collection_csv, collection_vector
 import re  # Add this import at the top of your file
 from pprint import *
 
+MAX_COPIES = 4  # Maximum copies allowed for each card
+
 
 def load_collection(csv_path):
-    df = pd.read_csv(csv_path)
-    df['total_copies'] = df['Normal'] + df['Foil']
-    # Filter out entries with total_copies = 0
-    df = df[df['total_copies'] > 0]  # Only keep entries with copies greater than 0
-    # Use sanitize_string instead of lambda for name processing
-    return df.set_index(df['Name'].apply(sanitize_string))['total_copies'].to_dict()  # Pre-process names
+    # {sanitized name: Normal + Foil copies} for every card with at least one copy
+    return read_collection_csv(csv_path)
 
 def parse_decklist(decklist_text):
     decklist = {}
@@ -23,25 +22,129 @@ def parse_decklist(decklist_text):
         decklist[name] = quantity
     return decklist
 
-def generate_final_deck(decklist, collection, finder, progress_callback=None):
+def deck_colors(decklist, finder):
+    """Ink colors substitutes may use: the colors of the original decklist, at most 2."""
+    original_colors = set()
+    for card_name in decklist.keys():
+        card = finder.find_card_by_name(card_name)
+        card_color = card.get('color') if card else None
+        if card_color:
+            original_colors.add(card_color)
+
+    return list(original_colors)[:2]  # Keep only 2 colors
+
+def collection_counts(collection, finder):
+    """Writable copy of a collection as a count vector aligned with finder.cards (dicts are converted)."""
+    if isinstance(collection, dict):
+        return collection_vector(collection, finder)
+    return np.array(collection, dtype=np.int32)
+
+def substitute_mask(decklist, finder):
+    """Cards allowed as substitutes: in the deck's colors and not sharing a name with a decklist card."""
+    original_colors = deck_colors(decklist, finder)
+    in_colors = np.array([card.get('color') in original_colors for card in finder.cards], dtype=bool)
+    deck_indices = [finder.find_card_index(card_name) for card_name in decklist]
+    deck_names = finder.canonical_indices[[idx for idx in deck_indices if idx is not None]]
+    return in_colors & ~np.isin(finder.canonical_indices, deck_names)
+
+def generate_optimal_deck(decklist, collection, finder, progress_callback=None, weights=None, similarity_function=None):
+    """
+    Rebuild the deck as a single assignment problem instead of card by card.
+
+    Copies the collection already has are kept, like in the greedy builder. Every other copy
+    in the decklist is a slot, matched against every available copy of every eligible
+    substitute (in the deck's colors, not in the decklist, within the collection counts and
+    the 4-copy limit) so the total similarity of the deck is maximal. Slots nothing can fill
+    go to dummy columns worth 0. The collection passed in is not modified.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    final_deck = {}
+    replacement_log = {}
+    total_cards = sum(decklist.values())
+    available = collection_counts(collection, finder)
+    canonical = finder.canonical_indices
+
+    # Keep the copies we own; the rest become slots to fill
+    open_slots = []  # (card_name, target_idx) for every copy that needs a substitute
+    for card_name, quantity in decklist.items():
+        target_idx = finder.find_card_index(card_name)
+        if target_idx is None:
+            replacement_log[card_name] = [("Error", f"Error finding similar cards to: {card_name}")]
+            continue
+        kept = min(quantity, int(available[canonical[target_idx]]), MAX_COPIES)
+        if kept:
+            final_deck[card_name] = kept
+            replacement_log[card_name] = [(card_name, "Added from your collection")] * kept
+        open_slots.extend([(card_name, target_idx)] * (quantity - kept))
+
+    # Eligible substitutes, one per card name (its canonical card), with the copies we can still use
+    usable_copies = np.minimum(available, MAX_COPIES)
+    eligible = substitute_mask(decklist, finder) & (canonical == np.arange(len(canonical))) & (usable_copies > 0)
+    candidate_indices = np.flatnonzero(eligible)
+
+    columns = []
+    assignment = {}
+    if open_slots and len(candidate_indices):
+        targets = sorted({target_idx for _, target_idx in open_slots})
+        target_rows = {target_idx: row for row, target_idx in enumerate(targets)}
+        copies = usable_copies[candidate_indices]
+        scores = finder.similarity_scores(targets, weights, similarity_function)[:, candidate_indices]
+
+        # Each slot only ever needs its best len(open_slots) candidate copies, which keeps the problem small
+        selected = set()
+        for row in range(len(targets)):
+            order = np.argsort(-scores[row], kind='stable')
+            enough = np.searchsorted(np.cumsum(copies[order]), len(open_slots)) + 1
+            selected.update(order[:enough].tolist())
+        columns = np.repeat(sorted(selected), copies[sorted(selected)])
+
+        slot_rows = np.array([target_rows[target_idx] for _, target_idx in open_slots])
+        profit = np.hstack([scores[slot_rows][:, columns], np.zeros((len(open_slots), len(open_slots)))])
+        slot_positions, assigned = linear_sum_assignment(profit, maximize=True)
+        assignment = dict(zip(slot_positions.tolist(), assigned.tolist()))
+
+    for position, (card_name, target_idx) in enumerate(open_slots):
+        column = assignment.get(position, len(columns))
+        log = replacement_log.setdefault(card_name, [])
+        if column < len(columns):
+            name = finder.cards[candidate_indices[columns[column]]]['simpleName']
+            final_deck[name] = final_deck.get(name, 0) + 1
+            log.append((name, f"Similarity Score: {profit[position, column]:.2f}"))
+        else:
+            log.append((card_name, f"No Cards in your collection found to substitute this card"))
+
+    if progress_callback:
+        progress_callback({'current': total_cards, 'total': total_cards})
+    return final_deck, replacement_log
+
+def generate_final_deck(decklist, collection, finder, progress_callback=None, weights=None, similarity_function=None,
+                        optimize=False):
 
     '''
+    Pick substitutes card by card and copy by copy, or with optimize=True solve the whole
+    deck at once (see generate_optimal_deck).
     '''
-    #pprint(collection)
+    if optimize:
+        return generate_optimal_deck(decklist, collection, finder, progress_callback, weights, similarity_function)
 
     final_deck = {}
     replacement_log = {}  # Log replacements for display
-    max_copies = 4  # Maximum copies allowed for each card
+    max_copies = MAX_COPIES  # Maximum copies allowed for each card
 
-    # Track colors of the original decklist
-    original_colors = set()
-    for card_name in decklist.keys():
-        #print(finder.find_card_by_name(card_name))
-        card_color = finder.find_card_by_name(card_name).get('color')  # Assuming color is stored in the collection
-        if card_color:
-            original_colors.add(card_color)
+    # Collection and copies already in the final deck, both as count vectors indexed by
+    # canonical card index, so checking a candidate is a few array lookups
+    available = collection_counts(collection, finder)
+    used = np.zeros_like(available)
+    canonical = finder.canonical_indices
+    name_indices = {card['simpleName']: canonical[idx] for idx, card in enumerate(finder.cards)}
+
+    # Cards in the original decklist's colors that aren't in the decklist themselves
+    substitutable = substitute_mask(decklist, finder)
 
-    original_colors = list(original_colors)[:2]  # Keep only 2 colors
+    def is_usable(candidate):
+        name_idx = candidate[3]
+        return substitutable[name_idx] and available[name_idx] > 0 and used[name_idx] < max_copies
     
     # Track progress
     total_cards = sum(decklist.values())
@@ -50,8 +153,13 @@ def generate_final_deck(decklist, collection, finder, progress_callback=None):
     # iterate through the original decklist
     # Extract Card name and quanity of cards in the decklist
     for card_name, quantity in decklist.items():
-        #initialize with specific value to be able to cache results
-        similar_cards = "Intial Empty Similar Card Results"
+        target_idx = finder.find_card_index(card_name)
+        name_idx = canonical[target_idx] if target_idx is not None else None
+        # Lazy ranking, started the first time a copy needs a substitute. Availability only goes
+        # down, so a rejected candidate never becomes usable again: later copies resume from the
+        # last pick instead of walking the ranking from the top.
+        ranking = None
+        candidate = None
 
         #itrate through each copy of the card
         for _ in range(quantity):
@@ -60,11 +168,12 @@ def generate_final_deck(decklist, collection, finder, progress_callback=None):
                 progress_callback({'current': processed_cards, 'total': total_cards})
 
             #if we have that card in our collection AND the card isn't already 4 times in the final deck
-            if collection.get(card_name, 0) > 0 and final_deck.get(card_name, 0) < max_copies:  # Check if we can add more copies:
+            if name_idx is not None and available[name_idx] > 0 and used[name_idx] < max_copies:
                 # Add this available card to our final deck
                 final_deck[card_name] = final_deck.get(card_name, 0) + 1
+                used[name_idx] += 1
                 # reduce the number of copies in our collection
-                collection[card_name] -= 1
+                available[name_idx] -= 1
 
                 if card_name not in replacement_log:
                     replacement_log[card_name] = []
@@ -72,65 +181,44 @@ def generate_final_deck(decklist, collection, finder, progress_callback=None):
 
             else:
 
-                if similar_cards == "Intial Empty Similar Card Results":
+                if ranking is None:
                     # Find similar replacements if this is the first time
-                    target_card, similar_cards = finder.find_similar_cards(card_name, num_results=25)
-
-                if similar_cards is None:
+                    target_card, ranking = finder.iter_similar_cards(card_name, weights=weights,
+                                                                     similarity_function=similarity_function,
+                                                                     breakdowns=False)
+                    if ranking is not None:
+                        # Copies are counted per name, at the name's canonical index
+                        ranking = ((similar_card, breakdown, score, name_indices[similar_card['simpleName']])
+                                   for similar_card, breakdown, score in ranking)
+
+                if ranking is None:
                     if card_name not in replacement_log:
                         replacement_log[card_name] = []
                     replacement_log[card_name].append(("Error", f"Error finding similar cards to: {card_name}"))
                     break    
 
-                found_valid_card = False
+                # Best-ranked card in the right colors, still in the collection and under the copy limit
+                if candidate is None or not is_usable(candidate):
+                    candidate = next((entry for entry in ranking if is_usable(entry)), None)
 
-                # iterate through each found similar card 
-                for similar_card, _, similarity_score in similar_cards:
+                if candidate is not None:
+                    similar_card, _, similarity_score, similar_name_idx = candidate
                     similar_card_name = similar_card['simpleName']
-                    similar_card_color = similar_card.get('color')  # Assuming color is stored in the similar card
-
-                     # Check if the similar card matches one of the original colors
-                    if similar_card_color in original_colors:
-                        # Check if not in original decklist and if we have a copy of this card
-                        if collection.get(similar_card_name, 0) > 0 and similar_card_name not in decklist:
-                            # Check max copies for similar card in the final deck list  
-                            if final_deck.get(similar_card_name, 0) < max_copies:  
-                                    # add card copy to final deck
-                                    final_deck[similar_card_name] = final_deck.get(similar_card_name, 0) + 1
-                                    # reduce the number of copies in our collection
-                                    collection[similar_card_name] -= 1
-                                    
-                                    # Log replacement
-                                    if card_name not in replacement_log:
-                                        replacement_log[card_name] = []
-                                    replacement_log[card_name].append((similar_card_name, f"Similarity Score: {similarity_score:.2f}"))
-                                    found_valid_card = True
-                                    break
-
-                # If no valid card found, try again with more results
-                if not found_valid_card:
-                     # Log replacement
+                    # add card copy to final deck
+                    final_deck[similar_card_name] = final_deck.get(similar_card_name, 0) + 1
+                    used[similar_name_idx] += 1
+                    # reduce the number of copies in our collection
+                    available[similar_name_idx] -= 1
+
+                    # Log replacement
+                    if card_name not in replacement_log:
+                        replacement_log[card_name] = []
+                    replacement_log[card_name].append((similar_card_name, f"Similarity Score: {similarity_score:.2f}"))
+                else:
+                    # Nothing in the whole ranking is usable
                     if card_name not in replacement_log:
                         replacement_log[card_name] = []
                     replacement_log[card_name].append((card_name, f"No Cards in your collection found to substitute this card"))
-                                    
-                    # target_card, similar_cards = finder.find_similar_cards(card_name, num_results=20)
-                    # for similar_card, _, similarity_score in similar_cards:
-                    #     similar_card_name = similar_card['simpleName']
-                    #     similar_card_color = similar_card.get('color')  # Assuming color is stored in the similar card
-
-                    #     if collection.get(similar_card_name, 0) > 0 and similar_card_name not in decklist:  # Check if not in original decklist
-                    #         if final_deck.get(similar_card_name, 0) < max_copies:  # Check max copies for similar card
-                    #             # Check if the similar card matches one of the original colors
-                    #             if similar_card_color in original_colors:
-                    #                 final_deck[similar_card_name] = final_deck.get(similar_card_name, 0) + 1
-                    #                 collection[similar_card_name] -= 1
-                                    
-                    #                 # Log replacement
-                    #                 if card_name not in replacement_log:
-                    #                     replacement_log[card_name] = []
-                    #                 replacement_log[card_name].append((similar_card_name, f"Similarity Score: {similarity_score:.2f}"))
-                    #                 break
 
     return final_deck, replacement_log
 
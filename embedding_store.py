@@ -0,0 +1,111 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+
+
+def _write_atomically(path, write):
+    """Call `write(f)` on a uniquely named temporary file next to `path`, then rename it over `path`."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class EmbeddingStore:
+    """
+    Content-addressed cache of ability embeddings.
+
+    Vectors live in a single float32 `embeddings.npy` file that is memory-mapped on load,
+    and `manifest.json` lists the key of every row. A key is the SHA-256 of the model name
+    and the processed ability text, so a renamed card reuses its vector while a card whose
+    text changed misses the cache instead of being served a stale embedding.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, directory, model_name):
+        self.directory = directory
+        self.model_name = model_name
+        self.vectors_path = os.path.join(directory, 'embeddings.npy')
+        self.manifest_path = os.path.join(directory, 'manifest.json')
+        self.vectors = None
+        self._rows = {}
+
+    @staticmethod
+    def key(model_name, text):
+        """Cache key for an ability text embedded with the given model."""
+        return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def load(self):
+        """Memory-map the stored vectors. Returns False if there is no usable cache."""
+        if not os.path.exists(self.manifest_path) or not os.path.exists(self.vectors_path):
+            return False
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != self.FORMAT_VERSION or manifest.get('model_name') != self.model_name:
+                return False
+            vectors = np.load(self.vectors_path, mmap_mode='r')
+        except (OSError, ValueError):
+            # Truncated or corrupt: treat it as a miss and re-embed
+            return False
+        keys = manifest['keys']
+        if len(keys) > len(vectors):
+            return False
+
+        self.vectors = vectors
+        self._rows = {key: row for row, key in enumerate(keys)}
+        return True
+
+    def get(self, text):
+        """Return the embedding for an ability text, or None if it has not been encoded."""
+        row = self._rows.get(self.key(self.model_name, text))
+        if row is None:
+            return None
+        return self.vectors[row]
+
+    def __contains__(self, text):
+        return self.key(self.model_name, text) in self._rows
+
+    def __len__(self):
+        return len(self._rows)
+
+    def add(self, texts, vectors):
+        """Append embeddings for texts that are not in the store yet."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        start = len(self._rows)
+        if start == 0:
+            self.vectors = vectors
+        else:
+            self.vectors = np.concatenate([self.vectors[:start], vectors])
+        for offset, text in enumerate(texts):
+            self._rows[self.key(self.model_name, text)] = start + offset
+
+    def save(self):
+        """Write the vectors and manifest atomically so concurrent readers never see a torn file."""
+        os.makedirs(self.directory, exist_ok=True)
+        keys = [None] * len(self._rows)
+        for key, row in self._rows.items():
+            keys[row] = key
+
+        vectors = np.asarray(self.vectors, dtype=np.float32)
+        _write_atomically(self.vectors_path, lambda f: np.save(f, vectors))
+
+        manifest = json.dumps({
+            'version': self.FORMAT_VERSION,
+            'model_name': self.model_name,
+            'dim': int(self.vectors.shape[1]) if self.vectors.ndim == 2 else 0,
+            'keys': keys
+        })
+        _write_atomically(self.manifest_path, lambda f: f.write(manifest.encode('utf-8')))
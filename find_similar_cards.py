@@ -1,44 +1,108 @@
-import os
 import json
-from sentence_transformers import SentenceTransformer, SimilarityFunction
-from sklearn.metrics.pairwise import cosine_similarity
-from scipy.spatial.distance import euclidean
-from sklearn.preprocessing import OneHotEncoder
+import time
+import hashlib
+import threading
+from enum import Enum
+from contextlib import contextmanager
 import numpy as np
+from card_index import AutocompleteIndex, CardNameIndex, sanitize_string
+from concept_matcher import ConceptMatcher
+from embedding_store import EmbeddingStore
+from finder_snapshot import read_snapshot, source_checksum, write_snapshot
+from result_cache import LRUResultCache
+from similarity_matrices import SimilarityMatrices
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Order in which the per-feature similarities are reported and weighted. Every feature scores
+# a pair of cards between 0 and 1:
+#   ink_cost, strength, willpower, lore_points: 1 - |difference| of the stats normalized to
+#       NUMERIC_FEATURE_RANGES
+#   tags, mechanics: Jaccard similarity of the two sets
+#   ability: embedding similarity times (1 + the concept boost, capped at 1), capped at 1;
+#       0 unless both cards have ability text
+#   ink_color: 1 for the same color string, else Jaccard similarity of the individual inks
+#   card_type: 1 for the same type (one of CARD_TYPES), else 0
+#   inkwell: 1 if both are inkable, 0.5 if neither is, 0 otherwise
+FEATURES = [
+    "ink_cost", "strength", "willpower", "lore_points", "tags",
+    "ability", "mechanics", "ink_color", "card_type", "inkwell"
+]
+NUMERIC_FEATURE_RANGES = {"ink_cost": (1, 10), "strength": (1, 10), "willpower": (1, 10), "lore_points": (0, 5)}
+CARD_TYPES = ["Character", "Action", "Item", "Location"]
+
+class SimilarityFunction(str, Enum):
+    """Ability similarity functions; values match sentence_transformers.SimilarityFunction."""
+    COSINE = "cosine"
+    DOT_PRODUCT = "dot"
+    EUCLIDEAN = "euclidean"
+    MANHATTAN = "manhattan"
+
+SIMILARITY_FUNCTIONS = {
+    'cosine': SimilarityFunction.COSINE,
+    'dot': SimilarityFunction.DOT_PRODUCT,
+    'euclidean': SimilarityFunction.EUCLIDEAN,
+    'manhattan': SimilarityFunction.MANHATTAN
+}
+
+DEFAULT_WEIGHTS = {
+    "ink_cost": 0.15,
+    "strength": 0.1,
+    "willpower": 0.1,
+    "lore_points": 0.1,
+    "tags": 0.01,
+    "ability": 0.24,
+    "mechanics": 0.15,
+    "ink_color": 0.05,
+    "card_type": 0.05,
+    "inkwell": 0.05
+}
+
+# Keys accepted by the query filters (see LorcanaCardFinder.resolve_filters)
+FILTER_KEYS = ('colors', 'min_cost', 'max_cost', 'types', 'inkable', 'sets')
+
+# Named weight vectors that requests can ask for instead of sending every weight
+WEIGHT_PRESETS = {
+    "default": DEFAULT_WEIGHTS,
+    "ability_focused": {
+        "ink_cost": 0.1, "strength": 0.05, "willpower": 0.05, "lore_points": 0.05, "tags": 0.01,
+        "ability": 0.45, "mechanics": 0.2, "ink_color": 0.03, "card_type": 0.03, "inkwell": 0.03
+    },
+    "stats_focused": {
+        "ink_cost": 0.25, "strength": 0.15, "willpower": 0.15, "lore_points": 0.15, "tags": 0.01,
+        "ability": 0.1, "mechanics": 0.09, "ink_color": 0.03, "card_type": 0.05, "inkwell": 0.02
+    }
+}
 
 class LorcanaCardFinder:
-    def __init__(self, json_path, embeddings_cache_path='embeddings_cache.json', recache_embeddings=False):
-        """Initialize the card finder with path to JSON data and embeddings cache."""
+    # Attributes restored from a compiled snapshot instead of being rebuilt
+    SNAPSHOT_STATE = [
+        'cards', 'card_formats', 'ability_embeddings', 'name_index', 'autocomplete_index',
+        'concept_matcher', '_numeric_features', '_tag_matrix', '_mechanics_matrix', '_color_codes',
+        '_color_matrix', '_type_codes', '_inkwell', '_embedding_matrix', '_has_ability',
+        '_concept_vectors', '_concept_totals', 'dataset_version'
+    ]
+
+    def __init__(self, json_path, embeddings_cache_path='embeddings_cache', recache_embeddings=False,
+                 similarity_matrices_path='similarity_matrices.npy', snapshot_path='finder_snapshot.pkl',
+                 result_cache_size=512):
+        """Initialize the card finder with path to JSON data, embeddings cache, similarity matrices and snapshot."""
         self.json_path = json_path
         self.embeddings_cache_path = embeddings_cache_path
+        self.similarity_matrices_path = similarity_matrices_path
+        self.snapshot_path = snapshot_path
         self.recache_embeddings = recache_embeddings
-        self.model = SentenceTransformer('all-MiniLM-L6-v2', device="cpu")
+        # The SentenceTransformer (and torch) is only loaded if an ability text needs encoding
+        self._model = None
+        self._model_lock = threading.Lock()
         self.similarity_function = SimilarityFunction.COSINE  # Default
-        self.model.similarity_fn_name = self.similarity_function
-        self.important_phrases = ["draw a card", "opposing players", "opposing characters"]
-        self.weights = {
-            "ink_cost": 0.15,
-            "strength": 0.1,
-            "willpower": 0.1,
-            "lore_points": 0.1,
-            "tags": 0.01,
-            "ability": 0.24,
-            "mechanics": 0.15,
-            "ink_color": 0.05,
-            "card_type": 0.05,
-            "inkwell": 0.05
-        }
-        self.cards = self._load_cards()
-        self._filter_cards()
-        
-        # Load or precompute embeddings
-        self.card_formats = {}
-        self.ability_embeddings = {}
-        self._load_embeddings()  # Load embeddings from cache or initialize
-        if self.recache_embeddings:
-            self._precompute_card_data()
-            self._save_embeddings()
-        
+        # Ranked results keyed on (card, weights, similarity function, dataset version)
+        self.result_cache = LRUResultCache(max_entries=result_cache_size)
+        # Defaults for requests that don't pass their own weights or similarity function
+        self.weights = dict(DEFAULT_WEIGHTS)
+        # Optional `stage_observer(stage, seconds)` told how long each query stage took
+        # (lookup, scoring, top_k, explain), e.g. to feed latency metrics
+        self.stage_observer = None
         # Define important ability concepts with weights and related phrases
         self.ability_concepts = {
             "card_draw": {
@@ -79,21 +143,122 @@ class LorcanaCardFinder:
             }
         }
 
+        self.embeddings_reused = 0
+        self.embeddings_encoded = 0
+
+        # Warm start from the compiled snapshot, or build everything from the card JSON
+        if not self._load_snapshot():
+            self._build_state()
+            if self.snapshot_path:
+                self.save_snapshot(self.snapshot_path)
+        # Position of the card each card's name resolves to, so name-keyed data (like collection
+        # counts) can live in arrays aligned with self.cards
+        self.canonical_indices = self._build_canonical_indices()
+        # Arrays and cached masks for query filters (colors, cost range, type, inkable, set)
+        self._filter_fields = self._build_filter_fields()
+        self._filter_cache = LRUResultCache(max_entries=128)
+        self._all_cards_mask = np.ones(len(self.cards), dtype=bool)
+        self._freeze_arrays()
+
+        # Per-feature N x N matrices so any weight vector is a single weighted sum over a row
+        self.similarity_matrices = None
+        if self.similarity_matrices_path:
+            self._load_similarity_matrices()
+
+    def _build_state(self):
+        """Load, filter and index the cards, then compute embeddings and feature arrays."""
+        self.cards = self._load_cards()
+        self._filter_cards()
+        self.name_index = CardNameIndex(self.cards)
+        self.autocomplete_index = AutocompleteIndex(self.cards)
+        
+        # Load or precompute embeddings
+        self.card_formats = {}
+        self.ability_embeddings = {}
+        self._convert_card_formats()
+        self._load_embeddings()  # Load embeddings from cache or initialize
+        if self.recache_embeddings:
+            self._precompute_card_data()
+            if self.embeddings_encoded:
+                self._save_embeddings()
+        self._assign_card_embeddings()
+
+        self.concept_matcher = ConceptMatcher(self.ability_concepts)
+
+        # Per-card NumPy arrays used by the vectorized scoring engine
+        self._build_feature_arrays()
+        self.dataset_version = self._compute_dataset_version()
+
+    def _load_snapshot(self):
+        """Restore the finder state from the compiled snapshot if it matches the card database."""
+        if not self.snapshot_path:
+            return False
+
+        self.source_checksum = source_checksum(self.json_path, MODEL_NAME, self.ability_concepts)
+        snapshot = read_snapshot(self.snapshot_path, self.source_checksum)
+        if snapshot is None:
+            return False
+
+        manifest, state = snapshot
+        # A snapshot built without some embeddings can't serve a finder that was asked to recache them
+        if self.recache_embeddings and not manifest['complete_embeddings']:
+            return False
+
+        for attribute in self.SNAPSHOT_STATE:
+            setattr(self, attribute, state[attribute])
+        print("Loaded finder state from snapshot.")
+        return True
+
+    def save_snapshot(self, path):
+        """Compile the current finder state into a versioned snapshot file."""
+        abilities = [self.card_formats[card['simpleName']]['ability'] for card in self.cards]
+        manifest = {
+            'checksum': source_checksum(self.json_path, MODEL_NAME, self.ability_concepts),
+            'dataset_version': self.dataset_version,
+            'num_cards': len(self.cards),
+            'complete_embeddings': all(has or not ability.strip()
+                                       for has, ability in zip(self._has_ability, abilities))
+        }
+        write_snapshot(path, manifest, {attribute: getattr(self, attribute) for attribute in self.SNAPSHOT_STATE})
+        print("Finder snapshot saved.")
+
+    @property
+    def model(self):
+        """SentenceTransformer model, loaded on first use."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    print("Loading sentence transformer model...")
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(MODEL_NAME, device="cpu")
+                    model.similarity_fn_name = self.similarity_function.value
+                    self._model = model
+        return self._model
+
     def _load_embeddings(self):
-        """Load embeddings from a cache file if it exists."""
-        if os.path.exists(self.embeddings_cache_path):
-            with open(self.embeddings_cache_path, 'r', encoding='utf-8') as f:
-                self.ability_embeddings = json.load(f)
+        """Memory-map embeddings from the content-addressed cache if it exists."""
+        self.embedding_store = EmbeddingStore(self.embeddings_cache_path, MODEL_NAME)
+        if self.embedding_store.load():
             print("Loaded embeddings from cache.")
         else:
             print("No cached embeddings found. Precomputing embeddings...")
 
     def _save_embeddings(self):
-        """Save embeddings to a cache file."""
-        with open(self.embeddings_cache_path, 'w', encoding='utf-8') as f:
-            json.dump(self.ability_embeddings, f)
+        """Save embeddings to the content-addressed cache."""
+        self.embedding_store.save()
         print("Embeddings saved to cache.")
 
+    def _assign_card_embeddings(self):
+        """Look up each card's embedding by the hash of its processed ability text."""
+        self.ability_embeddings = {}
+        for card in self.cards:
+            ability = self.card_formats[card['simpleName']]['ability']
+            if not ability.strip():
+                continue
+            embedding = self.embedding_store.get(ability)
+            if embedding is not None:
+                self.ability_embeddings[card['simpleName']] = embedding
+
     def _load_cards(self):
         """Load card data from JSON file."""
         with open(self.json_path, 'r', encoding='utf-8') as f:
@@ -105,147 +270,30 @@ class LorcanaCardFinder:
         """Normalize numerical values to 0-1."""
         return (value - min_val) / (max_val - min_val)
 
-    def _calculate_numeric_similarity(self, val1, val2, min_val, max_val):
-        """Calculate similarity between numeric values."""
-        norm1 = self._normalize(val1, min_val, max_val)
-        norm2 = self._normalize(val2, min_val, max_val)
-        return 1 - euclidean([norm1], [norm2])
-
-    def _calculate_categorical_similarity(self, cat1, cat2, categories):
-        """Calculate similarity between categorical values."""
-        if not cat1 or not cat2 or cat1 not in categories or cat2 not in categories:
-            return 0.0
-        
-        encoder = OneHotEncoder(categories=[categories], sparse_output=False)
-        encoded = encoder.fit_transform([[cat1], [cat2]])
-        return cosine_similarity([encoded[0]], [encoded[1]])[0][0]
-
-    def _calculate_tag_similarity(self, tags1, tags2):
-        """Calculate Jaccard similarity between tag sets."""
-        set1, set2 = set(tags1), set(tags2)
-        return len(set1 & set2) / len(set1 | set2) if len(set1 | set2) > 0 else 0
-
-    def _calculate_mechanics_similarity(self, mechanics1, mechanics2):
-        """Calculate Jaccard similarity between mechanics sets."""
-        set1, set2 = set(mechanics1), set(mechanics2)
-        return len(set1 & set2) / len(set1 | set2) if len(set1 | set2) > 0 else 0
+    def _convert_card_formats(self):
+        """Convert every card to the internal format, keyed by simpleName."""
+        for card in self.cards:
+            self.card_formats[card['simpleName']] = self._convert_card_format(card)
 
     def _precompute_card_data(self):
-        """Pre-compute card formats and embeddings."""
+        """Encode only the ability texts that are not in the embedding cache yet."""
         print("Pre-computing card data...")
-        all_abilities = []
-        ability_map = {}
+        all_abilities = list(dict.fromkeys(
+            card_format['ability'] for card_format in self.card_formats.values()
+            if card_format['ability'].strip()
+        ))
+        new_abilities = [ability for ability in all_abilities if ability not in self.embedding_store]
         
-        # First pass: convert formats and collect abilities
-        for card in self.cards:
-            card_format = self._convert_card_format(card)
-            self.card_formats[card['simpleName']] = card_format
-            
-            if card_format['ability'].strip():
-                all_abilities.append(card_format['ability'])
-                ability_map[len(all_abilities) - 1] = card['simpleName']
-        
-        # Batch compute all embeddings at once
-        if all_abilities:
+        # Batch compute the missing embeddings at once
+        if new_abilities:
             print("Computing ability embeddings...")
-            all_embeddings = self.model.encode(all_abilities, batch_size=32, show_progress_bar=True)
-            
-            # Map embeddings back to cards
-            for idx, embedding in enumerate(all_embeddings):
-                card_name = ability_map[idx]
-                self.ability_embeddings[card_name] = embedding.tolist()  # Convert to list for JSON serialization
-        
-        print("Pre-computation complete!")
-
-    def _calculate_ability_similarity(self, ability1, ability2, card1_name, card2_name):
-        """Calculate similarity between ability texts using embeddings and concept matching."""
-        if not ability1.strip() or not ability2.strip():
-            return 0.0
-            
-        # Get embeddings
-        embedding1 = self.ability_embeddings.get(card1_name)
-        embedding2 = self.ability_embeddings.get(card2_name)
-        
-        if embedding1 is None or embedding2 is None:
-            return 0.0
-        
-        # Convert embeddings to NumPy arrays
-        embedding1 = np.array(embedding1)
-        embedding2 = np.array(embedding2)
-
-        # Calculate base similarity using embeddings
-        base_similarity = cosine_similarity(
-            embedding1.reshape(1, -1), 
-            embedding2.reshape(1, -1)
-        )[0][0]
-        
-        # Normalize similarity score for non-cosine metrics
-        if self.similarity_function in [SimilarityFunction.EUCLIDEAN, SimilarityFunction.MANHATTAN]:
-            max_distance = 20.0
-            base_similarity = max(0, 1 - abs(base_similarity) / max_distance)
-        
-        # Calculate concept-based similarity boost
-        def calculate_concept_score(text, concept_data):
-            text = text.lower()
-            matches = []
-            
-            for phrase in concept_data["phrases"]:
-                # Calculate Levenshtein distance for fuzzy matching
-                if self._fuzzy_phrase_match(text, phrase):
-                    matches.append(phrase)
-            
-            # Calculate score based on matches and weight
-            match_ratio = len(matches) / len(concept_data["phrases"])
-            return min(1.0, match_ratio) * concept_data["weight"]
+            new_embeddings = self.model.encode(new_abilities, batch_size=32, show_progress_bar=True)
+            self.embedding_store.add(new_abilities, new_embeddings)
         
-        # Calculate concept scores for both abilities
-        concept_boost = 0.0
-        for concept, data in self.ability_concepts.items():
-            score1 = calculate_concept_score(ability1, data)
-            score2 = calculate_concept_score(ability2, data)
-            
-            # Average the concept scores between both abilities
-            concept_boost += (score1 + score2) / 2
-
-        # Combine base similarity with concept boost
-        final_similarity = base_similarity * (1.0 + min(concept_boost, 1.0))
-        
-        return min(final_similarity, 1.0)
-
-    def _fuzzy_phrase_match(self, text, phrase, threshold=0.85):
-        """
-        Check if phrase appears in text using fuzzy matching.
-        Returns True if a close match is found.
-        """
-        # Simple word-by-word matching
-        text_words = text.split()
-        phrase_words = phrase.split()
-        
-        for i in range(len(text_words) - len(phrase_words) + 1):
-            window = text_words[i:i + len(phrase_words)]
-            
-            # Calculate similarity for each word pair
-            matches = sum(1 for w1, w2 in zip(window, phrase_words)
-                         if self._word_similarity(w1, w2) > threshold)
-            
-            if matches / len(phrase_words) > threshold:
-                return True
-                
-        return False
-
-    def _word_similarity(self, word1, word2):
-        """
-        Calculate similarity between two words using character-level comparison.
-        Returns a score between 0 and 1.
-        """
-        # Convert to sets of characters for comparison
-        set1, set2 = set(word1), set(word2)
-        
-        # Calculate Jaccard similarity
-        intersection = len(set1 & set2)
-        union = len(set1 | set2)
-        
-        return intersection / union if union > 0 else 0.0
+        self.embeddings_reused = len(all_abilities) - len(new_abilities)
+        self.embeddings_encoded = len(new_abilities)
+        print(f"Pre-computation complete! Reused {self.embeddings_reused} cached embeddings, "
+              f"encoded {self.embeddings_encoded} new ability texts.")
 
     def _find_mechanics(self, card):
         """Find mechanics based on predefined keywords in card text."""
@@ -298,7 +346,7 @@ class LorcanaCardFinder:
                     mechanics.update(keyword for keyword in MECHANIC_KEYWORDS 
                                    if keyword in text_lower)
         
-        return list(mechanics)  # Convert set back to list
+        return sorted(mechanics)  # Sorted list so the order is stable across processes
 
     def _convert_card_format(self, card):
         """Convert JSON card data to internal format."""
@@ -339,70 +387,297 @@ class LorcanaCardFinder:
             "inkwell": card.get('inkwell', False)
         }
 
-    def _calculate_inkwell_similarity(self, inkwell1, inkwell2):
-        """Calculate similarity based on inkwell capability."""
-        if inkwell1 and inkwell2:
-            return 1.0
-        elif inkwell1 != inkwell2:
-            return 0.0
-        else:
-            return 0.5
+    def _build_feature_arrays(self):
+        """Pack every card attribute used for scoring into NumPy arrays aligned with self.cards."""
+        # Cards sharing a simpleName share one cached format, exactly like the per-pair lookups did
+        formats = [self.card_formats[card['simpleName']] for card in self.cards]
 
-    def _calculate_ink_color_similarity(self, color1, colors1, color2, colors2):
-        """Calculate similarity between ink colors, handling dual colors."""
-        # If both cards have the same exact color attribute
-        if color1 == color2:
-            return 1.0
-        
-        # If we have a list of colors, use that for comparison
-        if colors1 and colors2:
-            # Calculate overlap as Jaccard similarity
-            intersection = len(set(colors1) & set(colors2))
-            union = len(set(colors1) | set(colors2))
-            
-            if union == 0:  # Avoid division by zero
-                return 0.0
-            
-            return intersection / union
-        
-        # If only one card has the colors list, extract colors from the hyphenated format
-        colors1_set = set(colors1) if colors1 else set(color1.split('-'))
-        colors2_set = set(colors2) if colors2 else set(color2.split('-'))
-        
-        intersection = len(colors1_set & colors2_set)
-        union = len(colors1_set | colors2_set)
-        
-        if union == 0:  # Avoid division by zero
-            return 0.0
-        
-        return intersection / union
-
-    def _calculate_card_similarity(self, card1, card2, card1_name, card2_name):
-        """Calculate overall similarity between two cards using cached data."""
-        similarities = {
-            "ink_cost": self._calculate_numeric_similarity(card1["ink_cost"], card2["ink_cost"], 1, 10),
-            "strength": self._calculate_numeric_similarity(card1["strength"], card2["strength"], 1, 10),
-            "willpower": self._calculate_numeric_similarity(card1["willpower"], card2["willpower"], 1, 10),
-            "lore_points": self._calculate_numeric_similarity(card1["lore_points"], card2["lore_points"], 0, 5),
-            "tags": self._calculate_tag_similarity(card1["tags"], card2["tags"]),
-            "ability": self._calculate_ability_similarity(card1["ability"], card2["ability"], card1_name, card2_name),
-            "mechanics": self._calculate_mechanics_similarity(card1["mechanics"], card2["mechanics"]),
-            # Replace the old ink_color calculation
-            "ink_color": self._calculate_ink_color_similarity(
-                card1["ink_color"], card1.get("ink_colors", []),
-                card2["ink_color"], card2.get("ink_colors", [])
-            ),
-            "card_type": self._calculate_categorical_similarity(
-                card1["card_type"], card2["card_type"],
-                ["Character", "Action", "Item", "Location"]
-            ),
-            "inkwell": self._calculate_inkwell_similarity(card1["inkwell"], card2["inkwell"])
-        }
+        # Numeric stats, normalized to their NUMERIC_FEATURE_RANGES
+        self._numeric_features = {}
+        for feature, (min_val, max_val) in NUMERIC_FEATURE_RANGES.items():
+            values = np.array([f[feature] for f in formats], dtype=np.float64)
+            self._numeric_features[feature] = self._normalize(values, min_val, max_val)
+
+        # Set-valued features as multi-hot matrices so Jaccard becomes a matrix product
+        self._tag_matrix = self._multi_hot([f["tags"] for f in formats])
+        self._mechanics_matrix = self._multi_hot([f["mechanics"] for f in formats])
+
+        # Ink colors: exact color string code plus the set of individual inks
+        color_codes = {}
+        self._color_codes = np.array([color_codes.setdefault(f["ink_color"], len(color_codes))
+                                      for f in formats])
+        self._color_matrix = self._multi_hot([
+            f["ink_colors"] if f["ink_colors"] else f["ink_color"].split('-') for f in formats
+        ])
+
+        self._type_codes = np.array([CARD_TYPES.index(f["card_type"]) if f["card_type"] in CARD_TYPES else -1
+                                     for f in formats])
+        self._inkwell = np.array([bool(f["inkwell"]) for f in formats])
+
+        # Ability: unit-normalized embeddings and the per-card concept score vectors
+        dim = next((len(e) for e in self.ability_embeddings.values()), 0)
+        embeddings = np.zeros((len(self.cards), dim), dtype=np.float32)
+        has_ability = np.zeros(len(self.cards), dtype=bool)
+        for idx, (card, card_format) in enumerate(zip(self.cards, formats)):
+            embedding = self.ability_embeddings.get(card['simpleName'])
+            if not card_format["ability"].strip() or embedding is None:
+                continue
+            embeddings[idx] = embedding
+            has_ability[idx] = True
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        self._embedding_matrix = np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+        self._has_ability = has_ability
+        # The boost only depends on each card's own concept scores, so it is computed once per card
+        self._concept_vectors = self.concept_matcher.concept_vectors(
+            [card_format["ability"] if in_pool else '' for card_format, in_pool in zip(formats, has_ability)]
+        )
+        self._concept_totals = self._concept_vectors.sum(axis=1)
+
+    def _build_canonical_indices(self):
+        """For every card, the index its simpleName resolves to (the first card with that name)."""
+        canonical_indices = np.arange(len(self.cards), dtype=np.intp)
+        for idx, card in enumerate(self.cards):
+            canonical = self.name_index.lookup(card.get('simpleName', ''))
+            if canonical is not None:
+                canonical_indices[idx] = canonical
+        return canonical_indices
+
+    def _freeze_arrays(self):
+        """Mark the feature arrays read-only, so pages inherited from a preloading parent are never written to."""
+        for array in (*self._numeric_features.values(), self._tag_matrix, self._mechanics_matrix,
+                      self._color_codes, self._color_matrix, self._type_codes, self._inkwell,
+                      self._embedding_matrix, self._has_ability, self._concept_vectors, self._concept_totals,
+                      self.canonical_indices, self._all_cards_mask, *self._filter_fields.values()):
+            array.setflags(write=False)
+
+    @staticmethod
+    def _multi_hot(value_lists):
+        """Encode a list of value collections as a (cards x vocabulary) 0/1 matrix."""
+        vocabulary = {}
+        for values in value_lists:
+            for value in values:
+                vocabulary.setdefault(value, len(vocabulary))
+        matrix = np.zeros((len(value_lists), max(len(vocabulary), 1)), dtype=np.float64)
+        for row, values in enumerate(value_lists):
+            for value in values:
+                matrix[row, vocabulary[value]] = 1.0
+        return matrix
+
+    @staticmethod
+    def _jaccard_rows(matrix, targets, columns=None):
+        """Jaccard similarity of each target row against every row (or the given rows) of a multi-hot matrix."""
+        pool = matrix if columns is None else matrix[columns]
+        intersection = matrix[targets] @ pool.T
+        union = matrix[targets].sum(axis=1)[:, None] + pool.sum(axis=1)[None, :] - intersection
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+    @staticmethod
+    def _jaccard_pairs(matrix, rows, columns):
+        """Jaccard similarity of each (rows[k], columns[k]) pair of rows of a multi-hot matrix."""
+        intersection = np.einsum('ij,ij->i', matrix[rows], matrix[columns])
+        union = matrix[rows].sum(axis=1) + matrix[columns].sum(axis=1) - intersection
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+    def _ability_similarity_rows(self, targets, similarity_function=None, columns=None):
+        """Ability similarity (as defined next to FEATURES) of target cards against the pool."""
+        targets = np.asarray(targets)
+        pool = slice(None) if columns is None else np.asarray(columns)
+        base_similarity = self._embedding_matrix[targets] @ self._embedding_matrix[pool].T
+        return self._boosted_ability(base_similarity, targets[:, None], pool, similarity_function)
+
+    def _ability_similarity_pairs(self, rows, columns, similarity_function=None):
+        """Like _ability_similarity_rows, for each (rows[k], columns[k]) card pair."""
+        base_similarity = np.einsum('ij,ij->i', self._embedding_matrix[rows], self._embedding_matrix[columns])
+        return self._boosted_ability(base_similarity, rows, columns, similarity_function)
+
+    def _boosted_ability(self, base_similarity, targets, pool, similarity_function=None):
+        """Apply the distance rescaling, concept boost and has-ability mask to embedding dot products."""
+        similarity_function = similarity_function or self.similarity_function
+        base_similarity = base_similarity.astype(np.float64)
+        if similarity_function in [SimilarityFunction.EUCLIDEAN, SimilarityFunction.MANHATTAN]:
+            max_distance = 20.0
+            base_similarity = np.maximum(0, 1 - np.abs(base_similarity) / max_distance)
+        concept_boost = (self._concept_totals[targets] + self._concept_totals[pool]) / 2
+        ability = np.minimum(base_similarity * (1.0 + np.minimum(concept_boost, 1.0)), 1.0)
+        both_have_ability = self._has_ability[targets] & self._has_ability[pool]
+        return np.where(both_have_ability, ability, 0.0)
 
-        overall_similarity = sum(self.weights[feature] * similarities[feature] 
-                            for feature in similarities)
+    def _feature_similarity_rows(self, targets, similarity_function=None, columns=None, features=FEATURES):
+        """
+        Score target cards against the whole pool (or only the `columns` card indices) in a few
+        array operations. Returns a dict mapping each of `features` to a (len(targets), pool size)
+        array of similarities as defined next to FEATURES.
+        """
+        targets = np.asarray(targets)
+        pool = slice(None) if columns is None else np.asarray(columns)
+        similarities = {}
+
+        for feature, normalized in self._numeric_features.items():
+            if feature in features:
+                similarities[feature] = 1 - np.abs(normalized[targets][:, None] - normalized[pool][None, :])
+
+        if "tags" in features:
+            similarities["tags"] = self._jaccard_rows(self._tag_matrix, targets, columns)
+        if "ability" in features:
+            similarities["ability"] = self._ability_similarity_rows(targets, similarity_function, columns)
+        if "mechanics" in features:
+            similarities["mechanics"] = self._jaccard_rows(self._mechanics_matrix, targets, columns)
+
+        if "ink_color" in features:
+            same_color = self._color_codes[targets][:, None] == self._color_codes[pool][None, :]
+            similarities["ink_color"] = np.where(same_color, 1.0,
+                                                 self._jaccard_rows(self._color_matrix, targets, columns))
+
+        if "card_type" in features:
+            target_types = self._type_codes[targets][:, None]
+            similarities["card_type"] = ((target_types == self._type_codes[pool][None, :]) &
+                                         (target_types >= 0)).astype(np.float64)
+
+        if "inkwell" in features:
+            target_inkwell = self._inkwell[targets][:, None]
+            pool_inkwell = self._inkwell[pool][None, :]
+            similarities["inkwell"] = np.where(target_inkwell & pool_inkwell, 1.0,
+                                               np.where(target_inkwell != pool_inkwell, 0.0, 0.5))
+
+        return {feature: similarities[feature] for feature in features}
+
+    def _feature_similarity_pairs(self, rows, columns, similarity_function=None):
+        """Like _feature_similarity_rows, for each (rows[k], columns[k]) card pair; returns 1-D arrays."""
+        rows = np.asarray(rows)
+        columns = np.asarray(columns)
+        similarities = {}
+
+        for feature, normalized in self._numeric_features.items():
+            similarities[feature] = 1 - np.abs(normalized[rows] - normalized[columns])
+
+        similarities["tags"] = self._jaccard_pairs(self._tag_matrix, rows, columns)
+        similarities["ability"] = self._ability_similarity_pairs(rows, columns, similarity_function)
+        similarities["mechanics"] = self._jaccard_pairs(self._mechanics_matrix, rows, columns)
+
+        same_color = self._color_codes[rows] == self._color_codes[columns]
+        similarities["ink_color"] = np.where(same_color, 1.0, self._jaccard_pairs(self._color_matrix, rows, columns))
+
+        similarities["card_type"] = ((self._type_codes[rows] == self._type_codes[columns]) &
+                                     (self._type_codes[rows] >= 0)).astype(np.float64)
+
+        row_inkwell = self._inkwell[rows]
+        column_inkwell = self._inkwell[columns]
+        similarities["inkwell"] = np.where(row_inkwell & column_inkwell, 1.0,
+                                           np.where(row_inkwell != column_inkwell, 0.0, 0.5))
+
+        return {feature: similarities[feature] for feature in FEATURES}
+
+    def _similarity_rows(self, targets, similarity_function, columns=None):
+        """
+        Per-feature similarity rows for the targets, read from the precomputed matrices when available.
+        With `columns`, only those card indices are scored (or read), in that order.
+        """
+        if self.similarity_matrices is None:
+            return self._feature_similarity_rows(targets, similarity_function, columns)
+
+        rows = self.similarity_matrices.rows(targets, columns)
+        similarities = {feature: rows[idx] for idx, feature in enumerate(self.similarity_matrices.features)}
+        # The stored ability matrix uses cosine/dot scoring; distance metrics are rescored live
+        if similarity_function in [SimilarityFunction.EUCLIDEAN, SimilarityFunction.MANHATTAN]:
+            similarities["ability"] = self._ability_similarity_rows(targets, similarity_function, columns)
+        return similarities
+
+    @contextmanager
+    def _timed_stage(self, stage):
+        """Report the duration of the block to the stage observer, if there is one."""
+        observer = self.stage_observer
+        if observer is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            observer(stage, time.perf_counter() - start)
+
+    def _overall_rows(self, targets, weights, similarity_function, columns=None):
+        """
+        Ranking phase: the weighted overall similarity of the targets against the pool (or the
+        `columns` card indices) as a (len(targets), pool size) array. Feature rows are summed as
+        they are produced and features weighted 0 are skipped; no breakdown is kept.
+        """
+        feature_weights = {feature: weight for feature, weight in zip(FEATURES, weights) if weight}
+
+        if self.similarity_matrices is None:
+            if not feature_weights:
+                return np.zeros((len(targets), len(self.cards) if columns is None else len(columns)))
+            rows = self._feature_similarity_rows(targets, similarity_function, columns, features=tuple(feature_weights))
+            overall = np.zeros_like(rows[next(iter(feature_weights))])
+            for feature, weight in feature_weights.items():
+                overall += weight * rows[feature]
+            return overall
+
+        # The stored ability matrix uses cosine/dot scoring; distance metrics are rescored live
+        live_ability = similarity_function in [SimilarityFunction.EUCLIDEAN, SimilarityFunction.MANHATTAN]
+        stored_weights = {feature: weight for feature, weight in feature_weights.items()
+                          if not (live_ability and feature == "ability")}
+        overall = self.similarity_matrices.weighted_rows(targets, stored_weights, columns)
+        if live_ability and "ability" in feature_weights:
+            overall += feature_weights["ability"] * self._ability_similarity_rows(targets, similarity_function, columns)
+        return overall
+
+    def _explain(self, targets, card_indices, similarity_function):
+        """
+        Explanation phase: per-feature breakdown dicts for each target against its own few chosen
+        cards (`card_indices[i]` for `targets[i]`). Returns one list of dicts per target.
+        """
+        counts = [len(indices) for indices in card_indices]
+        if not sum(counts):
+            return [[] for _ in targets]
+        rows = np.repeat(np.asarray(targets, dtype=np.intp), counts)
+        columns = np.concatenate([np.asarray(indices, dtype=np.intp) for indices in card_indices])
+        similarities = self._pair_similarities(rows, columns, similarity_function)
+        pair_breakdowns = [dict(zip(FEATURES, values))
+                           for values in zip(*(similarities[feature].tolist() for feature in FEATURES))]
+
+        breakdowns = []
+        start = 0
+        for count in counts:
+            breakdowns.append(pair_breakdowns[start:start + count])
+            start += count
+        return breakdowns
+
+    def _pair_similarities(self, rows, columns, similarity_function):
+        """Per-feature similarity of each (rows[k], columns[k]) card pair, as a dict of 1-D arrays."""
+        if self.similarity_matrices is None:
+            return self._feature_similarity_pairs(rows, columns, similarity_function)
+
+        values = self.similarity_matrices.pairs(rows, columns)
+        similarities = {feature: values[idx] for idx, feature in enumerate(self.similarity_matrices.features)}
+        # The stored ability matrix uses cosine/dot scoring; distance metrics are rescored live
+        if similarity_function in [SimilarityFunction.EUCLIDEAN, SimilarityFunction.MANHATTAN]:
+            similarities["ability"] = self._ability_similarity_pairs(rows, columns, similarity_function)
+        return similarities
+
+    def _compute_dataset_version(self):
+        """Fingerprint of everything the similarity scores depend on."""
+        digest = hashlib.sha1()
+        digest.update(json.dumps(FEATURES).encode('utf-8'))
+        digest.update(json.dumps([self.card_formats[card['simpleName']] for card in self.cards],
+                                 sort_keys=True).encode('utf-8'))
+        for array in (self._embedding_matrix, self._has_ability, self._concept_vectors):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def _load_similarity_matrices(self):
+        """Load the per-feature similarity matrices, rebuilding them if the card data changed."""
+        self.similarity_matrices = SimilarityMatrices.load(self.similarity_matrices_path, self.dataset_version)
+        if self.similarity_matrices is not None:
+            print("Loaded similarity matrices from cache.")
+            return
 
-        return similarities, overall_similarity
+        print("Pre-computing similarity matrices...")
+        self.similarity_matrices = SimilarityMatrices.build(
+            lambda targets: self._feature_similarity_rows(targets, SimilarityFunction.COSINE),
+            len(self.cards), FEATURES, self.dataset_version
+        )
+        self.similarity_matrices.save(self.similarity_matrices_path)
+        print("Similarity matrices saved to cache.")
 
     def _filter_cards(self):
         """Filter out enchanted and promotional cards, and deduplicate by fullName."""
@@ -429,81 +704,334 @@ class LorcanaCardFinder:
         # Update self.cards with filtered list
         self.cards = list(filtered_cards.values())
     
+    def find_card_index(self, card_name):
+        """Return the position of a card in self.cards, resolved through the name index."""
+        return self.name_index.lookup(card_name)
+
     def find_card_by_name(self, card_name):
+        """Find a card by simpleName, fullName or a known spelling variant."""
+        target_idx = self.find_card_index(card_name)
+        if target_idx is None:
+            return None
+        return self.cards[target_idx]
 
-        target_card = None
+    def resolve_weights(self, weights=None):
+        """
+        Turn a preset name, a weights dict or None (the finder defaults) into an
+        immutable tuple of weights in FEATURES order.
+        """
+        if weights is None:
+            weights = self.weights
+        elif isinstance(weights, str):
+            if weights not in WEIGHT_PRESETS:
+                raise ValueError(f"Invalid weight preset. Choose from: {', '.join(WEIGHT_PRESETS.keys())}")
+            weights = WEIGHT_PRESETS[weights]
 
-        #search by simple name
-        target_card = next((card for card in self.cards 
-                        if card.get('simpleName', '') == sanitize_string(card_name)), None)
-    
-        if target_card == None: #try full name
-            target_card = next((card for card in self.cards 
-                          if card.get('fullName', '') == sanitize_string(card_name)), None)
-        
-        return target_card
+        missing = [feature for feature in FEATURES if feature not in weights]
+        if missing:
+            raise ValueError(f"Missing weights for: {', '.join(missing)}")
+        resolved = []
+        for feature in FEATURES:
+            try:
+                weight = float(weights[feature])
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid weight for {feature}: {weights[feature]!r}") from None
+            # NaN and infinities fail this too, and would otherwise silently break the ranking
+            if not (0.0 <= weight < float('inf')):
+                raise ValueError(f"Weight for {feature} must be a finite number >= 0")
+            resolved.append(weight)
+        resolved = tuple(resolved)
+        if abs(sum(resolved) - 1.0) > 0.001:
+            raise ValueError("Weights must sum to 1.0")
+        return resolved
 
-    def find_similar_cards(self, card_name, num_results=5):
-        """Find similar cards to the given card name using cached data."""
-        target_card = next((card for card in self.cards 
-                      if card.get('simpleName', '') == sanitize_string(card_name)), None)
-        
-        # Make sure we're getting the new color fields
-        converted_target = self.card_formats.get(target_card['simpleName'])
-        if not converted_target:
-            converted_target = self._convert_card_format(target_card)
-        
-        if target_card is None:
-            return None, None
-        
-        converted_target = self.card_formats.get(target_card['simpleName'])
-        if not converted_target:
-            converted_target = self._convert_card_format(target_card)
-        
-        similar_cards_details = []
-        seen_names = {target_card['fullName']}  # Track seen card names
-        
-        for card in self.cards:
-            # Skip if we've seen this card name already
-            if card['fullName'] in seen_names:
+    def resolve_similarity_function(self, function_name=None):
+        """Turn a similarity function name or None (the finder default) into a SimilarityFunction."""
+        if function_name is None:
+            return self.similarity_function
+        if isinstance(function_name, SimilarityFunction):
+            return function_name
+        if function_name.lower() not in SIMILARITY_FUNCTIONS:
+            raise ValueError(f"Invalid similarity function. Choose from: {', '.join(SIMILARITY_FUNCTIONS.keys())}")
+        return SIMILARITY_FUNCTIONS[function_name.lower()]
+
+    def resolve_filters(self, filters=None):
+        """
+        Turn a filters dict into a hashable key, or None when nothing is filtered. Supported keys:
+        colors (inks a card may use; dual-ink cards need both), min_cost, max_cost, types,
+        inkable and sets. List values may also be given as comma-separated strings.
+        """
+        if not filters:
+            return None
+        unknown = set(filters) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+        resolved = []
+        for name in FILTER_KEYS:
+            value = filters.get(name)
+            if value is None or value == '':
                 continue
-                
-            converted_card = self.card_formats.get(card['simpleName'])
-            if not converted_card:
-                converted_card = self._convert_card_format(card)
-            
-            similarities, overall_similarity = self._calculate_card_similarity(
-                converted_target, 
-                converted_card,
-                target_card['simpleName'],
-                card['simpleName']
-            )
-            similar_cards_details.append((card, similarities, overall_similarity))
-            seen_names.add(card['fullName'])
-        
-        similar_cards_details.sort(key=lambda x: x[2], reverse=True)
-        return target_card, similar_cards_details[:num_results]
+            if name in ('colors', 'types', 'sets'):
+                if isinstance(value, str):
+                    value = value.split(',')
+                value = tuple(sorted({str(item).strip().lower() for item in value if str(item).strip()}))
+                if not value:
+                    continue
+            elif name in ('min_cost', 'max_cost'):
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Invalid {name} filter: {value!r}") from None
+            elif isinstance(value, str):
+                value = value.strip().lower() in ('1', 'true', 'yes')
+            else:
+                value = bool(value)
+            resolved.append((name, value))
+        return tuple(resolved) or None
 
-    def set_similarity_function(self, function_name):
-        """Set the similarity function to use for ability comparison."""
-        valid_functions = {
-            'cosine': SimilarityFunction.COSINE,
-            'dot': SimilarityFunction.DOT_PRODUCT,
-            'euclidean': SimilarityFunction.EUCLIDEAN,
-            'manhattan': SimilarityFunction.MANHATTAN
+    def _filter_columns(self, filters):
+        """
+        (sorted card indices passing the filters, boolean mask over all cards) for a resolved
+        filters key; the indices are None when nothing is filtered. Cached per filter combination.
+        """
+        if filters is None:
+            return None, self._all_cards_mask
+
+        cached = self._filter_cache.get(filters)
+        if cached is not None:
+            return cached
+
+        fields = self._filter_fields
+        mask = np.ones(len(self.cards), dtype=bool)
+        for name, value in filters:
+            if name == 'colors':
+                allowed = np.isin(fields['ink_names'], value)
+                mask &= fields['inks'].any(axis=1) & ~(fields['inks'] & ~allowed).any(axis=1)
+            elif name == 'min_cost':
+                mask &= fields['cost'] >= value
+            elif name == 'max_cost':
+                mask &= (fields['cost'] <= value) & (fields['cost'] >= 0)
+            elif name == 'types':
+                mask &= np.isin(fields['type'], value)
+            elif name == 'inkable':
+                mask &= fields['inkable'] == value
+            elif name == 'sets':
+                mask &= np.isin(fields['set'], value)
+
+        mask.setflags(write=False)
+        columns = np.flatnonzero(mask)
+        columns.setflags(write=False)
+        self._filter_cache.put(filters, (columns, mask))
+        return columns, mask
+
+    def _build_filter_fields(self):
+        """Card attributes used by query filters, as arrays aligned with self.cards."""
+        card_inks = [[ink.strip().lower() for ink in (card.get('color') or '').split('-') if ink.strip()]
+                     for card in self.cards]
+        ink_names = sorted({ink for inks in card_inks for ink in inks})
+        inks = np.zeros((len(self.cards), len(ink_names)), dtype=bool)
+        for row, card_ink_list in enumerate(card_inks):
+            for ink in card_ink_list:
+                inks[row, ink_names.index(ink)] = True
+
+        fields = {
+            'ink_names': np.array(ink_names, dtype=object),
+            'inks': inks,
+            'cost': np.array([card['cost'] if isinstance(card.get('cost'), int) else -1 for card in self.cards]),
+            'type': np.array([str(card.get('type', '')).lower() for card in self.cards], dtype=object),
+            'inkable': np.array([bool(card.get('inkwell')) for card in self.cards], dtype=bool),
+            'set': np.array([str(card.get('setCode', '')).lower() for card in self.cards], dtype=object)
         }
-        if function_name.lower() not in valid_functions:
-            raise ValueError(f"Invalid similarity function. Choose from: {', '.join(valid_functions.keys())}")
+        return fields
+
+    def similarity_scores(self, targets, weights=None, similarity_function=None):
+        """Weighted overall similarity of each target card index against the whole pool, as a (len(targets), N) array."""
+        weights = self.resolve_weights(weights)
+        similarity_function = self.resolve_similarity_function(similarity_function)
+        return self._overall_rows(list(targets), weights, similarity_function)
+
+    def _ranked_results(self, targets, num_results, weights, similarity_function, filters=None):
+        """
+        Ranked (card, similarities, overall) lists for the target indices. Cached targets are
+        served from the result cache; the rest are ranked together on one (B, N) matrix of
+        overall scores, where N only covers the cards passing `filters` (a key from
+        resolve_filters), and per-feature breakdowns are then computed for the winners only.
+        """
+        columns, in_pool = self._filter_columns(filters)
+        pool_size = len(self.cards) if columns is None else len(columns)
+
+        results = {}
+        misses = []
+        for target_idx in targets:
+            # Enough results means num_results, or every candidate the filters leave
+            available = pool_size - (1 if in_pool[target_idx] else 0)
+            cache_key = (target_idx, weights, similarity_function.value, filters, self.dataset_version)
+            cached = self.result_cache.get(
+                cache_key, is_usable=lambda results: len(results) >= min(num_results, available)
+            )
+            if cached is not None:
+                results[target_idx] = cached[:num_results]
+            else:
+                misses.append(target_idx)
+
+        if misses:
+            with self._timed_stage('scoring'):
+                overall_similarity = self._overall_rows(misses, weights, similarity_function, columns)
+            pool = np.arange(len(self.cards)) if columns is None else columns
+
+            with self._timed_stage('top_k'):
+                # Never suggest the target card itself: it sorts last and is dropped below
+                scores = -overall_similarity
+                scores[pool[None, :] == np.array(misses)[:, None]] = np.inf
+                winners = [self._top_positions(scores[row], num_results) for row in range(len(misses))]
+
+            # Breakdowns are only computed for the winners
+            with self._timed_stage('explain'):
+                breakdowns = self._explain(misses, [pool[positions] for positions in winners], similarity_function)
+
+            for row, target_idx in enumerate(misses):
+                similar_cards_details = [
+                    (self.cards[pool[position]], breakdown, float(overall_similarity[row, position]))
+                    for position, breakdown in zip(winners[row], breakdowns[row])
+                ]
+                cache_key = (target_idx, weights, similarity_function.value, filters, self.dataset_version)
+                self.result_cache.put(cache_key, similar_cards_details)
+                results[target_idx] = similar_cards_details[:]
+        return results
+
+    @staticmethod
+    def _top_positions(scores, k):
+        """
+        Positions of the k lowest finite scores in a row, best first. Only the candidates that can
+        make the cut (the k smallest plus anything tied with the k-th) are sorted, and the stable
+        sort keeps pool order between ties, so the result matches a full stable argsort.
+        """
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+        if k < len(scores):
+            kth_score = np.partition(scores, k - 1)[k - 1]
+            candidates = np.flatnonzero(scores <= kth_score)
+        else:
+            candidates = np.arange(len(scores))
+        ranked = candidates[np.argsort(scores[candidates], kind='stable')][:k]
+        return ranked[np.isfinite(scores[ranked])]
+
+    def find_similar_cards(self, card_name, num_results=5, weights=None, similarity_function=None, filters=None):
+        """
+        Find similar cards to the given card name using the vectorized scoring engine.
+        `weights` (dict or preset name), `similarity_function` and `filters` (see
+        resolve_filters) apply to this call only; the finder itself is never modified, so
+        concurrent requests can't affect each other. Filtered cards are never scored.
+        """
+        weights = self.resolve_weights(weights)
+        similarity_function = self.resolve_similarity_function(similarity_function)
+        filters = self.resolve_filters(filters)
+        with self._timed_stage('lookup'):
+            target_idx = self.find_card_index(card_name)
         
-        self.similarity_function = valid_functions[function_name.lower()]
-        self.model.similarity_fn_name = self.similarity_function
+        if target_idx is None:
+            return None, None
+        
+        results = self._ranked_results([target_idx], num_results, weights, similarity_function, filters)
+        return self.cards[target_idx], results[target_idx]
 
-def sanitize_string(input_string):
-    # Remove all special characters except hyphens in words
-    sanitized = input_string.replace('!', '').replace(' - ', ' ').replace('.','')
-    sanitized = " ".join(sanitized.lower().strip().split())
+    def _rank_target(self, target_idx, weights, similarity_function):
+        """Score one target against the pool and argsort the row once (target excluded, stable ties)."""
+        with self._timed_stage('scoring'):
+            overall_similarity = self._overall_rows([target_idx], weights, similarity_function)[0]
+        with self._timed_stage('top_k'):
+            candidates = np.flatnonzero(np.arange(len(self.cards)) != target_idx)
+            ranked = candidates[np.argsort(-overall_similarity[candidates], kind='stable')]
+        return ranked, overall_similarity
 
-    return sanitized
+    def iter_similar_cards(self, card_name, weights=None, similarity_function=None, breakdowns=True):
+        """
+        Like find_similar_cards, but returns (target_card, iterator) where the iterator walks the
+        whole ranking lazily. The target's row is scored and argsorted once; breakdowns are
+        computed in small chunks as the iterator advances, or skipped (yielded as None) with
+        breakdowns=False. Returns (None, None) if not found.
+        """
+        weights = self.resolve_weights(weights)
+        similarity_function = self.resolve_similarity_function(similarity_function)
+        with self._timed_stage('lookup'):
+            target_idx = self.find_card_index(card_name)
+
+        if target_idx is None:
+            return None, None
+
+        ranked, overall_similarity = self._rank_target(target_idx, weights, similarity_function)
+        return self.cards[target_idx], self._iter_ranking(target_idx, ranked, overall_similarity,
+                                                             similarity_function, breakdowns)
+
+    def _iter_ranking(self, target_idx, ranked, overall_similarity, similarity_function, breakdowns, chunk_size=16):
+        if not breakdowns:
+            for idx in ranked:
+                yield self.cards[idx], None, float(overall_similarity[idx])
+            return
+        # Breakdowns are computed a few cards at a time, only as far as the caller iterates
+        for start in range(0, len(ranked), chunk_size):
+            chunk = ranked[start:start + chunk_size]
+            for idx, breakdown in zip(chunk, self._explain([target_idx], [chunk], similarity_function)[0]):
+                yield self.cards[idx], breakdown, float(overall_similarity[idx])
+
+    def find_similar_cards_batch(self, card_names, num_results=5, weights=None, similarity_function=None,
+                                 filters=None):
+        """
+        Find similar cards for many card names at once. Names resolving to the same card are
+        scored once; returns (target_card, similar_cards) pairs for the distinct cards in input
+        order, with (None, None) for names that weren't found.
+        """
+        return list(self.iter_similar_cards_batch(card_names, num_results, weights, similarity_function, filters))
+
+    def iter_similar_cards_batch(self, card_names, num_results=5, weights=None, similarity_function=None,
+                                 filters=None, chunk_size=None):
+        """
+        Generator version of find_similar_cards_batch. With a `chunk_size`, targets are scored
+        that many at a time and each pair is yielded as soon as its chunk is done, so callers
+        can stream results without holding the whole batch. Options are validated up front.
+        """
+        weights = self.resolve_weights(weights)
+        similarity_function = self.resolve_similarity_function(similarity_function)
+        filters = self.resolve_filters(filters)
+
+        with self._timed_stage('lookup'):
+            entries = self.distinct_card_indices(card_names)
+
+        return self._iter_ranked_chunks(entries, num_results, weights, similarity_function, filters,
+                                        chunk_size or max(len(entries), 1))
+
+    def distinct_card_indices(self, card_names):
+        """
+        Card indices of the distinct cards the names resolve to, in input order, with None for
+        each distinct name that wasn't found: one entry per pair the batch methods return.
+        """
+        entries = []
+        seen = set()
+        for card_name in card_names:
+            target_idx = self.find_card_index(card_name)
+            key = target_idx if target_idx is not None else ('missing', card_name)
+            if key not in seen:
+                seen.add(key)
+                entries.append(target_idx)
+        return entries
+
+    def _iter_ranked_chunks(self, entries, num_results, weights, similarity_function, filters, chunk_size):
+        for start in range(0, len(entries), chunk_size):
+            chunk = entries[start:start + chunk_size]
+            results = self._ranked_results([target_idx for target_idx in chunk if target_idx is not None],
+                                           num_results, weights, similarity_function, filters)
+            for target_idx in chunk:
+                if target_idx is None:
+                    yield None, None
+                else:
+                    yield self.cards[target_idx], results[target_idx]
+
+    def set_similarity_function(self, function_name):
+        """Set the default similarity function used when a request doesn't choose one."""
+        self.similarity_function = self.resolve_similarity_function(function_name)
+        if self._model is not None:
+            self._model.similarity_fn_name = self.similarity_function.value
 
 def format_card_details(card):
     """Format card details for display."""
@@ -636,8 +1164,7 @@ if __name__ == "__main__":
     
     for sim_function in similarity_functions:
         print(f"\nUsing {sim_function} similarity:")
-        finder.set_similarity_function(sim_function)
-        target_card, similar_cards = finder.find_similar_cards(card_name)
+        target_card, similar_cards = finder.find_similar_cards(card_name, similarity_function=sim_function)
         if target_card:
             print_card_comparison(target_card, similar_cards, finder)
         else:
@@ -0,0 +1,85 @@
+"""
+Compiled warm-start snapshot of LorcanaCardFinder state.
+
+Usage:
+    python finder_snapshot.py database/allCards.json --output finder_snapshot.pkl
+
+The snapshot holds the filtered cards, card formats, mechanics, embeddings, feature arrays
+and name indexes, preceded by a small manifest. The manifest's checksum covers the card
+JSON, the embedding model and the scoring configuration, so the finder only rebuilds when
+one of them changes.
+"""
+import os
+import json
+import pickle
+import hashlib
+import argparse
+import tempfile
+
+# Bump whenever the layout of the stored finder state changes
+SNAPSHOT_VERSION = 1
+
+
+def source_checksum(json_path, model_name, config):
+    """Checksum of the card database plus everything else the compiled state depends on."""
+    digest = hashlib.sha256()
+    digest.update(f"{SNAPSHOT_VERSION}\0{model_name}\0".encode('utf-8'))
+    digest.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+    with open(json_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_snapshot(path, checksum):
+    """Return (manifest, state) if the snapshot exists and matches the checksum, else None."""
+    if not path or not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            manifest = pickle.load(f)
+            if manifest.get('version') != SNAPSHOT_VERSION or manifest.get('checksum') != checksum:
+                return None
+            state = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+        # Truncated, corrupt or pickled by incompatible code: the finder rebuilds it
+        return None
+    return manifest, state
+
+
+def write_snapshot(path, manifest, state):
+    """Write manifest and state atomically, so a concurrently starting process never reads half a file."""
+    manifest = dict(manifest, version=SNAPSHOT_VERSION)
+    # A per-process temporary name, so workers writing at the same time never share a file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the card database into a finder snapshot.")
+    parser.add_argument('json_path', nargs='?', default='database/allCards.json')
+    parser.add_argument('--output', default='finder_snapshot.pkl')
+    parser.add_argument('--embeddings-cache', default='embeddings_cache')
+    args = parser.parse_args()
+
+    from find_similar_cards import LorcanaCardFinder
+    finder = LorcanaCardFinder(args.json_path, embeddings_cache_path=args.embeddings_cache,
+                               recache_embeddings=True, snapshot_path=None)
+    finder.save_snapshot(args.output)
+    print(f"Snapshot written to {args.output} ({len(finder.cards)} cards).")
+
+
+if __name__ == "__main__":
+    main()
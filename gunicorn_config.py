@@ -1,4 +1,18 @@
+import gc
+import os
+
 bind = "0.0.0.0:10000"
 workers = 4
 threads = 4
-timeout = 120 
\ No newline at end of file
+timeout = 120
+
+# Build the finder once in the master process; workers fork with its memory shared copy-on-write
+preload_app = True
+os.environ.setdefault("SIMILCANA_PRELOAD", "1")
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before any worker is forked.
+    # Freezing moves every object allocated so far out of the GC's reach, so collections
+    # in the workers never write to (and therefore never copy) the shared pages.
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Shared by every gunicorn worker on the machine, so any worker can report on any job
+DEFAULT_JOBS_PATH = os.path.join(tempfile.gettempdir(), 'similcana_jobs.sqlite3')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+FINISHED_STATUSES = (DONE, FAILED)
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+WORKER_LOST_ERROR = "The worker running this job stopped responding, please try again."
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the worker pool's queue is full."""
+
+
+class JobStore:
+    """
+    Background job state (status, progress, result) in a small SQLite database.
+
+    Every call opens its own short-lived connection, so the store can be used from request
+    threads and pool threads alike, and from every process that points at the same file.
+    Writes made by this process wake up local watchers through a condition variable; jobs
+    running in another process are picked up by re-reading the database on a timeout.
+
+    Queued or running jobs that haven't been updated for `stale_after` seconds are assumed
+    to belong to a worker that died and are marked failed; like finished jobs, they are
+    dropped `max_age` seconds after their last update.
+    """
+
+    def __init__(self, path=DEFAULT_JOBS_PATH, max_age=3600, stale_after=600):
+        self.path = path
+        self.max_age = max_age
+        self.stale_after = stale_after
+        self._changed = threading.Condition()
+        self._generation = 0
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    current INTEGER NOT NULL DEFAULT 0,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _execute(self, query, params=()):
+        conn = self._connect()
+        try:
+            with conn:
+                rowcount = conn.execute(query, params).rowcount
+        finally:
+            conn.close()
+
+        with self._changed:
+            self._generation += 1
+            self._changed.notify_all()
+        return rowcount
+
+    def create(self, kind, total=0):
+        """Register a new queued job and return its ID; stale jobs are failed and old ones dropped."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._execute('UPDATE jobs SET status = ?, error = ? WHERE updated < ? AND status IN (?, ?)',
+                      (FAILED, WORKER_LOST_ERROR, now - self.stale_after) + ACTIVE_STATUSES)
+        self._execute('DELETE FROM jobs WHERE updated < ? AND status IN (?, ?)', (now - self.max_age, DONE, FAILED))
+        self._execute('INSERT INTO jobs (id, kind, status, total, created, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                      (job_id, kind, QUEUED, total, now, now))
+        return job_id
+
+    def set_status(self, job_id, status):
+        self._execute('UPDATE jobs SET status = ?, updated = ? WHERE id = ?', (status, time.time(), job_id))
+
+    def update_progress(self, job_id, current, total):
+        self._execute('UPDATE jobs SET current = ?, total = ?, updated = ? WHERE id = ?',
+                      (current, total, time.time(), job_id))
+
+    def finish(self, job_id, result):
+        """Store a job's JSON-serializable result and mark it done."""
+        self._execute('UPDATE jobs SET status = ?, result = ?, updated = ? WHERE id = ?',
+                      (DONE, json.dumps(result), time.time(), job_id))
+
+    def fail(self, job_id, error):
+        self._execute('UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?',
+                      (FAILED, error, time.time(), job_id))
+
+    def get(self, job_id, include_result=True):
+        """Return the job as a dict, or None if it is unknown (or expired)."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT id, kind, status, current, total, error, ' + ('result' if include_result else 'NULL') +
+                ', updated FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        stale_before = time.time() - self.stale_after
+        if row[2] in ACTIVE_STATUSES and row[7] < stale_before:
+            # Only matches while still stale, so a job that just reported progress is left alone
+            if self._execute('UPDATE jobs SET status = ?, error = ? WHERE id = ? AND updated < ? AND status IN (?, ?)',
+                             (FAILED, WORKER_LOST_ERROR, job_id, stale_before) + ACTIVE_STATUSES):
+                row = row[:2] + (FAILED, row[3], row[4], WORKER_LOST_ERROR) + row[6:]
+
+        job = {
+            'job_id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'current': row[3],
+            'total': row[4],
+            'error': row[5]
+        }
+        if include_result:
+            job['result'] = json.loads(row[6]) if row[6] is not None else None
+        return job
+
+
+    def watch(self, job_id, poll_interval=1.0, idle_timeout=30, max_duration=300):
+        """
+        Yield the job (without its result) every time it changes, starting with its current
+        state. Stops once the job is finished or unknown, when nothing changed for
+        `idle_timeout` seconds, or after `max_duration` seconds; the caller can reconnect.
+        """
+        started = last_change = time.monotonic()
+        last_job = ()  # never equal to a job dict or None, so the first state is always sent
+        while True:
+            with self._changed:
+                generation = self._generation
+            job = self.get(job_id, include_result=False)
+            now = time.monotonic()
+            if job != last_job:
+                last_job, last_change = job, now
+                yield job
+            if job is None or job['status'] in FINISHED_STATUSES:
+                return
+            if now - last_change >= idle_timeout or now - started >= max_duration:
+                return
+
+            # Local writes wake us immediately; other processes' writes are seen after the timeout
+            with self._changed:
+                self._changed.wait_for(lambda: self._generation != generation, timeout=poll_interval)
+
+
+class JobRunner:
+    """
+    Bounded thread pool running jobs recorded in a JobStore.
+
+    `func(report, *args)` runs on a pool thread and receives a `report(progress)` callback
+    taking the usual {'current': ..., 'total': ...} dicts; its return value becomes the
+    job's result. At most `max_pending` jobs may be queued or running in this process.
+    """
+
+    def __init__(self, store, max_workers=2, max_pending=16):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, kind, func, *args, total=0):
+        """Queue a job and return its ID. Raises JobQueueFull when the pool is saturated."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull("Too many jobs are running, please try again in a moment.")
+            # Created on first use so a preloading gunicorn master never forks a pool's threads
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            self._pending += 1
+
+        try:
+            job_id = self.store.create(kind, total=total)
+            self._executor.submit(self._run, job_id, func, args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job_id
+
+    def _run(self, job_id, func, args):
+        try:
+            self.store.set_status(job_id, RUNNING)
+            report = lambda progress: self.store.update_progress(job_id, progress['current'], progress['total'])
+            self.store.finish(job_id, func(report, *args))
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            self.store.fail(job_id, str(e))
+        finally:
+            with self._lock:
+                self._pending -= 1
@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import fcntl
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Shared by every gunicorn worker on the machine, so any worker can report the totals of all of them
+DEFAULT_METRICS_PATH = os.path.join(tempfile.gettempdir(), 'similcana_metrics')
+
+# Counters and histograms of processes whose snapshots were removed, so totals never go backwards
+EXITED_FILE = 'exited.json'
+LOCK_FILE = 'metrics.lock'
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _labels_key(labels):
+    return json.dumps(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _add_values(total, values, definitions):
+    """Add the counters and histograms of `values` ({name: {labels key: value}}) into `total`; gauges are skipped."""
+    for name, series in values.items():
+        definition = definitions.get(name)
+        if definition is None or definition['kind'] == GAUGE:
+            continue
+        merged = total.setdefault(name, {})
+        for key, value in series.items():
+            if definition['kind'] == COUNTER:
+                merged[key] = merged.get(key, 0) + value
+                continue
+            histogram = merged.setdefault(key, {'buckets': [0] * len(value['buckets']), 'sum': 0.0, 'count': 0})
+            if len(histogram['buckets']) != len(value['buckets']):
+                continue  # written with other buckets by an older version
+            histogram['buckets'] = [a + b for a, b in zip(histogram['buckets'], value['buckets'])]
+            histogram['sum'] += value['sum']
+            histogram['count'] += value['count']
+    return total
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms for this process, exposed in Prometheus text format.
+
+    Every process periodically writes its samples to `<directory>/<pid>.json`, and rendering
+    merges the files of all processes sharing the directory: counters and histograms are
+    summed (including processes that have exited, so totals never go backwards), gauges are
+    reported per live process with a `pid` label. State inherited through a fork is dropped
+    on first use in the child, except for gauges like the finder's init duration.
+
+    Before the snapshot of a process that exited more than `max_age` seconds ago is deleted,
+    its counters and histograms are folded into `exited.json`. A process reusing the pid of
+    an earlier one carries that snapshot's totals forward instead of overwriting them.
+    """
+
+    def __init__(self, directory=DEFAULT_METRICS_PATH, flush_interval=5.0, max_age=24 * 3600):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.max_age = max_age
+        self._definitions = {}
+        self._values = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._dirty = False
+        self._flusher = None
+        # Totals from an earlier process with the same pid, read on this process's first flush
+        self._inherited = None
+        self._flush_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def define(self, name, kind, help_text, buckets=None):
+        """Declare a metric; histograms need their bucket upper bounds (+Inf is added)."""
+        self._definitions[name] = {'kind': kind, 'help': help_text,
+                                   'buckets': list(buckets) if buckets is not None else None}
+        self._values.setdefault(name, {})
+
+    def add_collector(self, collector):
+        """Register `collector(registry)`, called before every flush to set values read from elsewhere."""
+        self._collectors.append(collector)
+
+    def _check_fork(self):
+        # Called with the lock held
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._flusher = None
+            self._inherited = None
+            for name, definition in self._definitions.items():
+                if definition['kind'] != GAUGE:
+                    self._values[name] = {}
+
+    def _record(self, name, labels, update, start_flusher=True):
+        with self._lock:
+            self._check_fork()
+            series = self._values[name]
+            key = _labels_key(labels)
+            series[key] = update(series.get(key))
+            self._dirty = True
+        if start_flusher:
+            self._ensure_flusher()
+
+    def inc(self, name, value=1, **labels):
+        self._record(name, labels, lambda current: (current or 0) + value)
+
+    def set(self, name, value, **labels):
+        """
+        Set a gauge, or a counter whose running total is kept elsewhere (e.g. cache hits).
+        Unlike inc and observe this never starts the flush thread, so it is safe in a
+        preloading master; values set there are inherited by the workers.
+        """
+        self._record(name, labels, lambda current: value, start_flusher=False)
+
+    def observe(self, name, value, **labels):
+        buckets = self._definitions[name]['buckets']
+
+        def update(current):
+            histogram = current or {'buckets': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0}
+            position = next((idx for idx, bound in enumerate(buckets) if value <= bound), len(buckets))
+            histogram['buckets'][position] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+            return histogram
+        self._record(name, labels, update)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of the block, in seconds, into a histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock across processes, held while snapshots are folded or taken over."""
+        with open(os.path.join(self.directory, LOCK_FILE), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _ensure_flusher(self):
+        # Started on first use so a preloading gunicorn master never forks a running thread
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while os.getpid() == pid:
+            time.sleep(self.flush_interval)
+            if self._dirty:
+                self.flush()
+
+    def flush(self):
+        """Write this process's samples to its snapshot file."""
+        for collector in self._collectors:
+            collector(self)
+        with self._flush_lock:
+            with self._lock:
+                self._check_fork()
+                pid = self._pid
+                values = json.loads(json.dumps(self._values))
+                self._dirty = False
+
+            path = os.path.join(self.directory, f"{pid}.json")
+            if self._inherited is None:
+                with self._locked():
+                    previous = _read_json(path)
+                    self._inherited = _add_values({}, previous['values'], self._definitions) if previous else {}
+                    self._write_snapshot(path, pid, values)
+            else:
+                self._write_snapshot(path, pid, values)
+
+    def _write_snapshot(self, path, pid, values):
+        totals = _add_values(_add_values({}, self._inherited, self._definitions), values, self._definitions)
+        for name, series in values.items():
+            totals.setdefault(name, series)  # gauges
+        _write_json(path, {'pid': pid, 'updated': time.time(), 'values': totals})
+
+    def _read_snapshots(self):
+        """
+        Return (snapshots, exited values). Held under the lock, so snapshots are never counted
+        both in their own file and in exited.json while being folded.
+        """
+        snapshots = []
+        expired = []
+        exited_path = os.path.join(self.directory, EXITED_FILE)
+        now = time.time()
+        with self._locked():
+            exited = _read_json(exited_path) or {'values': {}}
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json') or name == EXITED_FILE:
+                    continue
+                path = os.path.join(self.directory, name)
+                snapshot = _read_json(path)
+                if snapshot is None:
+                    continue
+                alive = _pid_alive(snapshot['pid'])
+                if not alive and now - snapshot['updated'] > self.max_age:
+                    _add_values(exited['values'], snapshot['values'], self._definitions)
+                    expired.append(path)
+                    continue
+                snapshot['alive'] = alive
+                snapshots.append(snapshot)
+
+            if expired:
+                _write_json(exited_path, exited)
+                for path in expired:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        return snapshots, exited['values']
+
+    def collect(self):
+        """Merged samples of every process: {name: {labels key: value}}."""
+        self.flush()
+        snapshots, exited = self._read_snapshots()
+        merged = _add_values({name: {} for name in self._definitions}, exited, self._definitions)
+        for snapshot in snapshots:
+            _add_values(merged, snapshot['values'], self._definitions)
+            if not snapshot['alive']:
+                continue
+            for name, series in snapshot['values'].items():
+                definition = self._definitions.get(name)
+                if definition is None or definition['kind'] != GAUGE:
+                    continue
+                for key, value in series.items():
+                    labels = json.loads(key) + [['pid', str(snapshot['pid'])]]
+                    merged[name][json.dumps(labels)] = value
+        return merged
+
+    def render(self, merged=None):
+        """Prometheus text exposition of the merged samples."""
+        merged = self.collect() if merged is None else merged
+        lines = []
+        for name, definition in self._definitions.items():
+            lines.append(f"# HELP {name} {definition['help']}")
+            lines.append(f"# TYPE {name} {definition['kind']}")
+            for key, value in sorted(merged.get(name, {}).items()):
+                labels = [tuple(pair) for pair in json.loads(key)]
+                if definition['kind'] != HISTOGRAM:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(definition['buckets'] + [float('inf')], value['buckets']):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,53 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUResultCache:
+    """Thread-safe, bounded least-recently-used cache with hit/miss counters."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, is_usable=None):
+        """
+        Return the cached value for key, or None on a miss.
+        `is_usable(value)` can reject an entry (e.g. too few results), which counts as a miss.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None or (is_usable is not None and not is_usable(value)):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries
+            }
+
@@ -0,0 +1,133 @@
+import os
+import json
+import tempfile
+import numpy as np
+
+
+def _write_atomically(path, write):
+    """Call `write(f)` on a uniquely named temporary file next to `path`, then rename it over `path`."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                    prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SimilarityMatrices:
+    """
+    Precomputed N x N similarity matrix for every feature, stored as packed upper triangles.
+
+    All feature similarities are symmetric, so only the upper triangle (diagonal included)
+    is kept: element (i, j) with i <= j lives at offset(i) + (j - i). The packed array has
+    shape (len(features), N * (N + 1) / 2) and is persisted as a .npy file next to a small
+    JSON manifest, so it can be memory-mapped instead of being read into every process.
+    """
+
+    def __init__(self, packed, features, num_cards, fingerprint):
+        self.packed = packed
+        self.features = list(features)
+        self.num_cards = num_cards
+        self.fingerprint = fingerprint
+        positions = np.arange(num_cards, dtype=np.int64)
+        self._row_offsets = positions * num_cards - positions * (positions - 1) // 2
+
+    @classmethod
+    def build(cls, score_rows, num_cards, features, fingerprint, dtype=np.float32, chunk_size=128):
+        """
+        Compute every feature matrix chunk by chunk.
+        `score_rows(targets)` must return a dict mapping each feature to a (len(targets), N) array.
+        """
+        packed = np.empty((len(features), num_cards * (num_cards + 1) // 2), dtype=dtype)
+        matrices = cls(packed, features, num_cards, fingerprint)
+
+        for start in range(0, num_cards, chunk_size):
+            targets = np.arange(start, min(start + chunk_size, num_cards))
+            rows = score_rows(targets)
+            for row_idx, target in enumerate(targets):
+                offset = matrices._row_offsets[target]
+                for feature_idx, feature in enumerate(features):
+                    packed[feature_idx, offset:offset + num_cards - target] = rows[feature][row_idx, target:]
+
+        return matrices
+
+    @classmethod
+    def load(cls, path, fingerprint):
+        """Memory-map previously saved matrices, or return None if missing or stale."""
+        manifest_path = cls._manifest_path(path)
+        if not os.path.exists(path) or not os.path.exists(manifest_path):
+            return None
+
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('fingerprint') != fingerprint:
+                return None
+            packed = np.load(path, mmap_mode='r')
+        except (ValueError, OSError):
+            # Truncated or half-written by an older version: rebuild
+            return None
+
+        num_cards = manifest['num_cards']
+        if packed.shape != (len(manifest['features']), num_cards * (num_cards + 1) // 2):
+            return None
+        return cls(packed, manifest['features'], num_cards, fingerprint)
+
+    def save(self, path):
+        """
+        Persist the packed matrices and their manifest. Each file is written under a temporary
+        name and renamed into place, so processes that have the old file memory-mapped keep
+        reading it instead of crashing on a truncated mapping.
+        """
+        _write_atomically(path, lambda f: np.save(f, self.packed))
+        manifest = json.dumps({
+            'fingerprint': self.fingerprint,
+            'features': self.features,
+            'num_cards': self.num_cards,
+            'dtype': str(self.packed.dtype)
+        })
+        _write_atomically(self._manifest_path(path), lambda f: f.write(manifest.encode('utf-8')))
+
+    def row_indices(self, target, columns=None):
+        """Packed positions of the elements of row `target` of the full matrix (optionally only some columns)."""
+        columns = np.arange(self.num_cards, dtype=np.int64) if columns is None else np.asarray(columns, dtype=np.int64)
+        lower = self._row_offsets[columns] + (target - columns)  # (j, target) for j < target
+        upper = self._row_offsets[target] + (columns - target)   # (target, j) for j >= target
+        return np.where(columns < target, lower, upper)
+
+    def rows(self, targets, columns=None):
+        """Return an array of shape (len(features), len(targets), len(columns) or N) with every feature row."""
+        indices = np.stack([self.row_indices(target, columns) for target in targets])
+        return np.asarray(self.packed[:, indices], dtype=np.float64)
+
+    def weighted_rows(self, targets, weights, columns=None):
+        """
+        Weighted sum of the feature rows for the targets, as a (len(targets), len(columns) or N)
+        array. `weights` maps feature names to weights; features missing from it or weighted 0
+        are never read.
+        """
+        indices = np.stack([self.row_indices(target, columns) for target in targets])
+        overall = np.zeros(indices.shape, dtype=np.float64)
+        for feature_idx, feature in enumerate(self.features):
+            weight = weights.get(feature, 0.0)
+            if weight:
+                overall += weight * np.take(self.packed[feature_idx], indices).astype(np.float64)
+        return overall
+
+    def pairs(self, rows, columns):
+        """Return an array of shape (len(features), len(rows)) with the value of every (rows[k], columns[k]) pair."""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        lower = np.minimum(rows, columns)
+        upper = np.maximum(rows, columns)
+        return np.asarray(self.packed[:, self._row_offsets[lower] + (upper - lower)], dtype=np.float64)
+
+    @staticmethod
+    def _manifest_path(path):
+        return os.path.splitext(path)[0] + '_manifest.json'
@@ -86,6 +86,19 @@ function setLoading(isLoading) {
     }
 }
 
+// Result filters from the filter selects; empty selections are left out
+function currentFilters() {
+    const filters = {};
+    const fields = { colors: 'filterColor', types: 'filterType', max_cost: 'filterMaxCost', inkable: 'filterInkable' };
+    Object.entries(fields).forEach(([name, id]) => {
+        const select = document.getElementById(id);
+        if (select && select.value) {
+            filters[name] = select.value;
+        }
+    });
+    return filters;
+}
+
 function findSimilarCards() {
     if (!isSystemReady) {
         alert('Find Similar Cards: error message:System is still initializing, please wait...');
@@ -102,7 +115,9 @@ function findSimilarCards() {
         headers: {
             'Content-Type': 'application/x-www-form-urlencoded',
         },
-        body: `card_name=${encodeURIComponent(cardName)}&result_count=${encodeURIComponent(resultCount)}`
+        body: `card_name=${encodeURIComponent(cardName)}&result_count=${encodeURIComponent(resultCount)}` +
+              `&weights=${encodeURIComponent(JSON.stringify(currentWeights))}` +
+              `&filters=${encodeURIComponent(JSON.stringify(currentFilters()))}`
     })
     .then(response => response.json())
     .then(data => {
@@ -382,6 +397,9 @@ const defaultWeights = {
 };
 
 let currentWeights = { ...defaultWeights };
+let weightsApplyTimeout = null;
+const WEIGHTS_APPLY_DELAY = 250; // milliseconds
+const WEIGHTS_STORAGE_KEY = 'similcanaWeights';
 
 function initializeWeightsPanel() {
     const toggleButton = document.getElementById('toggleWeights');
@@ -396,10 +414,13 @@ function initializeWeightsPanel() {
             weightsControls.classList.contains('hidden') ? '▼' : '▲';
     });
     
-    // Initialize all sliders
+    // Initialize all sliders, restoring the weights chosen on any page
+    loadSavedWeights();
     document.querySelectorAll('.weight-slider').forEach(slider => {
+        slider.value = Math.round(currentWeights[slider.dataset.weightName] * 100);
         slider.addEventListener('input', updateWeights);
     });
+    updateWeights(false);
     
     // Reset weights
     resetButton.addEventListener('click', resetWeights);
@@ -408,7 +429,18 @@ function initializeWeightsPanel() {
     applyButton.addEventListener('click', applyWeights);
 }
 
-function updateWeights() {
+function loadSavedWeights() {
+    try {
+        const saved = JSON.parse(localStorage.getItem(WEIGHTS_STORAGE_KEY));
+        if (saved && Object.keys(defaultWeights).every(name => typeof saved[name] === 'number')) {
+            currentWeights = { ...defaultWeights, ...saved };
+        }
+    } catch (e) {
+        currentWeights = { ...defaultWeights };
+    }
+}
+
+function updateWeights(scheduleApply = true) {
     let total = 0;
     const sliders = document.querySelectorAll('.weight-slider');
     
@@ -435,6 +467,15 @@ function updateWeights() {
         totalElement.classList.remove('invalid');
         warningElement.classList.add('hidden');
         applyButton.disabled = false;
+        
+        if (scheduleApply === false) {
+            return;
+        }
+        // Re-rank as the sliders move; the server only does a weighted sum over precomputed rows
+        if (weightsApplyTimeout) {
+            clearTimeout(weightsApplyTimeout);
+        }
+        weightsApplyTimeout = setTimeout(applyWeights, WEIGHTS_APPLY_DELAY);
     }
 }
 
@@ -451,24 +492,18 @@ function resetWeights() {
 }
 
 function applyWeights() {
-    // Send weights to backend
-    fetch('/update_weights', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify(currentWeights)
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.success) {
-            // If there's an active search, refresh results
-            const currentSearch = document.getElementById('cardSearch').value;
-            if (currentSearch) {
-                findSimilarCards();
-            }
-        }
-    });
+    // Weights travel with every request, so applying them only stores them and refreshes results
+    try {
+        localStorage.setItem(WEIGHTS_STORAGE_KEY, JSON.stringify(currentWeights));
+    } catch (e) {
+        // Storage may be unavailable (private mode); the weights still apply to this page
+    }
+    
+    // If there's an active search, refresh results
+    const searchInput = document.getElementById('cardSearch');
+    if (searchInput && searchInput.value) {
+        findSimilarCards();
+    }
 }
 
 function initializeStickyHeader() {
@@ -549,22 +584,11 @@ function findSimilarCardsForBatch() {
     progressContainer.classList.remove('hidden');
     loadingSpinner.classList.add('hidden');
     
-    // Set up progress event source
-    if (progressEventSource) {
-        progressEventSource.close();
-    }
-    progressEventSource = new EventSource('/batch_progress');
-    progressEventSource.onmessage = function(event) {
-        const progress = JSON.parse(event.data);
-        const percentage = (progress.current / progress.total * 100) || 0;
-        progressBar.style.width = `${percentage}%`;
-        progressText.textContent = `Processing cards: ${progress.current}/${progress.total}`;
-        
-        if (progress.current >= progress.total && progress.total > 0) {
-            progressEventSource.close();
-        }
-    };
+    const resultsContainer = document.getElementById('batchResults');
+    resultsContainer.innerHTML = '';
+    let received = 0;
     
+    // Results arrive as NDJSON, one line per card, and are rendered as soon as each line is complete
     fetch('/find_similar_batch', {
         method: 'POST',
         headers: {
@@ -572,60 +596,114 @@ function findSimilarCardsForBatch() {
         },
         body: JSON.stringify({
             cards: processedCards,
-            result_count: resultCount
+            result_count: resultCount,
+            weights: currentWeights,
+            filters: currentFilters(),
+            stream: true
         })
     })
-    .then(response => response.json())
-    .then(data => {
-        progressContainer.classList.add('hidden');
-        if (data.error) {
-            alert(data.error);
-            return;
+    .then(response => readJsonLines(response, message => {
+        if (message.error) {
+            throw new Error(message.error);
         }
-        displayBatchResults(data);
-    })
+        if (message.result) {
+            received += 1;
+            appendBatchResult(resultsContainer, message.result);
+            updateProgressBar(progressBar, progressText, { current: received, total: processedCards.length });
+        }
+        if (message.done) {
+            progressContainer.classList.add('hidden');
+        }
+    }))
     .catch(error => {
         progressContainer.classList.add('hidden');
         console.error('Error:', error);
-        alert('An error occurred while fetching results');
+        alert(error.message || 'An error occurred while fetching results');
     });
 }
 
-function displayBatchResults(data) {
-    const resultsContainer = document.getElementById('batchResults');
-    resultsContainer.innerHTML = '';
+function readJsonLines(response, onMessage) {
+    // Feed every complete line of a streamed NDJSON (or plain JSON) response to onMessage
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    function pump() {
+        return reader.read().then(({ done, value }) => {
+            buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+            const lines = buffer.split('\n');
+            buffer = done ? '' : lines.pop();
+            lines.filter(line => line.trim()).forEach(line => onMessage(JSON.parse(line)));
+            return done ? undefined : pump();
+        });
+    }
+    return pump();
+}
 
-    // Create a container for each source card and its similar cards
-    data.forEach(result => {
-        const cardSection = document.createElement('div');
-        cardSection.className = 'batch-card-section';
+function updateProgressBar(progressBar, progressText, progress) {
+    const percentage = (progress.current / progress.total * 100) || 0;
+    progressBar.style.width = `${percentage}%`;
+    progressText.textContent = `Processing cards: ${progress.current}/${progress.total}`;
+}
+
+function watchJob(progressUrl, jobId, handlers) {
+    // Stream a background job's progress, then hand its result (or error) to the handlers
+    if (progressEventSource) {
+        progressEventSource.close();
+    }
+    progressEventSource = new EventSource(`${progressUrl}?job_id=${encodeURIComponent(jobId)}`);
+    progressEventSource.onmessage = function(event) {
+        const job = JSON.parse(event.data);
+        handlers.progress(job);
         
-        // Update header to include card-image-container for zoom functionality
-        cardSection.innerHTML = `
-            <div class="batch-card-header" onclick="toggleSection(this)">
-                <div class="card-image-container">
+        if (job.status === 'done') {
+            progressEventSource.close();
+            fetch(`/jobs/${encodeURIComponent(jobId)}`)
+                .then(response => response.json())
+                .then(result => {
+                    if (result.error) {
+                        handlers.failed(result.error);
+                    } else {
+                        handlers.done(result.result);
+                    }
+                })
+                .catch(error => handlers.failed(error.message));
+        } else if (job.status === 'failed') {
+            progressEventSource.close();
+            handlers.failed(job.error || 'The job failed');
+        }
+    };
+}
+
+function appendBatchResult(resultsContainer, result) {
+    const cardSection = document.createElement('div');
+    cardSection.className = 'batch-card-section';
+    
+    // Update header to include card-image-container for zoom functionality
+    cardSection.innerHTML = `
+        <div class="batch-card-header" onclick="toggleSection(this)">
+            <div class="card-image-container">
+                <img src="${result.target_card.image_url}" 
+                     class="batch-card-thumbnail" 
+                     data-card-image>
+                <div class="card-zoom">
                     <img src="${result.target_card.image_url}" 
-                         class="batch-card-thumbnail" 
-                         data-card-image>
-                    <div class="card-zoom">
-                        <img src="${result.target_card.image_url}" 
-                             alt="${result.target_card.details.fullName}">
-                    </div>
+                         alt="${result.target_card.details.fullName}">
                 </div>
-                <h3>${result.target_card.details.fullName}</h3>
-                <span class="expand-icon">▼</span>
             </div>
-            <div class="batch-card-content">
-                <div class="similar-cards-grid">
-                    ${result.similar_cards
-                        .map(card => createCompactCardHTML(card))
-                        .join('')}
-                </div>
+            <h3>${result.target_card.details.fullName}</h3>
+            <span class="expand-icon">▼</span>
+        </div>
+        <div class="batch-card-content">
+            <div class="similar-cards-grid">
+                ${result.similar_cards
+                    .map(card => createCompactCardHTML(card))
+                    .join('')}
             </div>
-        `;
-        
-        resultsContainer.appendChild(cardSection);
-    });
+        </div>
+    `;
+    
+    resultsContainer.appendChild(cardSection);
 }
 
 function createCompactCardHTML(card) {
@@ -769,6 +847,8 @@ document.addEventListener('DOMContentLoaded', function() {
             analyzeButton.disabled = true;
             initializeImageZoom();
         }
+    } else if (currentPath === '/deck-comparison') {
+        initializeCollectionUpload();
     }
     
     // Common initialization for both pages
@@ -776,10 +856,52 @@ document.addEventListener('DOMContentLoaded', function() {
 });
 
 let progressEventSource = null;
+const COLLECTION_STORAGE_KEY = 'similcanaCollectionId';
+
+function initializeCollectionUpload() {
+    const uploadInput = document.getElementById('collectionUpload');
+    const status = document.getElementById('collectionStatus');
+    if (!uploadInput) {
+        return;
+    }
+    if (localStorage.getItem(COLLECTION_STORAGE_KEY)) {
+        status.textContent = 'Using your uploaded collection';
+    }
+    
+    uploadInput.addEventListener('change', () => {
+        const file = uploadInput.files[0];
+        if (!file) {
+            return;
+        }
+        const formData = new FormData();
+        formData.append('collection', file);
+        status.textContent = 'Uploading...';
+        
+        fetch('/upload_collection', {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) {
+                status.textContent = data.error;
+                return;
+            }
+            // The server keeps the parsed collection; later analyses only send its ID
+            localStorage.setItem(COLLECTION_STORAGE_KEY, data.collection_id);
+            status.textContent = `Collection uploaded: ${data.cards} cards, ${data.copies} copies`;
+            document.getElementById('ignoreCollection').checked = false;
+        })
+        .catch(error => {
+            status.textContent = `Upload failed: ${error.message}`;
+        });
+    });
+}
 
 function analyzeDeck() {
     const deckInput = document.getElementById('deckInput').value;
     const ignoreCollection = document.getElementById('ignoreCollection').checked;
+    const optimizeDeck = document.getElementById('optimizeDeck');
     const loadingSpinner = document.getElementById('loadingSpinner');
     const deckResults = document.getElementById('deckResults');
     const finalDeckResults = document.getElementById('finalDeckResults');
@@ -797,22 +919,6 @@ function analyzeDeck() {
     finalDeckTableBody.innerHTML = '';
     finalDeckResults.classList.add('hidden');
 
-    // Set up progress event source
-    if (progressEventSource) {
-        progressEventSource.close();
-    }
-    progressEventSource = new EventSource('/deck_progress');
-    progressEventSource.onmessage = function(event) {
-        const progress = JSON.parse(event.data);
-        const percentage = (progress.current / progress.total * 100) || 0;
-        progressBar.style.width = `${percentage}%`;
-        progressText.textContent = `Processing cards: ${progress.current}/${progress.total}`;
-        
-        if (progress.current >= progress.total && progress.total > 0) {
-            progressEventSource.close();
-        }
-    };
-
     fetch('/analyze_deck', {
         method: 'POST',
         headers: {
@@ -820,39 +926,34 @@ function analyzeDeck() {
         },
         body: JSON.stringify({ 
             decklist: deckInput,
-            ignoreCollection: ignoreCollection
+            ignoreCollection: ignoreCollection,
+            optimize: optimizeDeck ? optimizeDeck.checked : false,
+            collection_id: localStorage.getItem(COLLECTION_STORAGE_KEY),
+            weights: currentWeights
         })
     })
     .then(response => response.json())
     .then(data => {
-        progressContainer.classList.add('hidden');
         if (data.error) {
+            progressContainer.classList.add('hidden');
             deckResults.innerHTML = `<p>Error: ${data.error}</p>`;
-        } else {
-            deckResults.innerHTML = data.html;
-
-            const finalDeck = data.final_deck;
-            if (Array.isArray(finalDeck)) {
-                finalDeck.forEach(card => {
-                    const row = document.createElement('tr');
-                    row.innerHTML = `
-                        <td>
-                            <img src="${card.image_url}" alt="${card.name}" style="width: 50px; height: auto;" data-card-image>
-                            <div class="card-zoom">
-                                <img src="${card.image_url}" alt="${card.name}">
-                            </div>
-                        </td>
-                        <td>${card.final_count}</td>
-                        <td>${card.name}</td>
-                    `;
-                    finalDeckTableBody.appendChild(row);
-                });
-                finalDeckResults.classList.remove('hidden');
-                initializeImageZoom();
-            } else {
-                deckResults.innerHTML = `<p>Error: Final deck data is not in the expected format.</p>`;
+            if (data.error.startsWith('Unknown or expired collection')) {
+                localStorage.removeItem(COLLECTION_STORAGE_KEY);
             }
+            return;
         }
+        // The analysis runs as a background job; follow its progress and fetch the result when done
+        watchJob('/deck_progress', data.job_id, {
+            progress: progress => updateProgressBar(progressBar, progressText, progress),
+            done: result => {
+                progressContainer.classList.add('hidden');
+                displayDeckAnalysis(result);
+            },
+            failed: error => {
+                progressContainer.classList.add('hidden');
+                deckResults.innerHTML = `<p>Error: ${error}</p>`;
+            }
+        });
     })
     .catch(error => {
         progressContainer.classList.add('hidden');
@@ -860,6 +961,36 @@ function analyzeDeck() {
     });
 }
 
+function displayDeckAnalysis(data) {
+    const deckResults = document.getElementById('deckResults');
+    const finalDeckResults = document.getElementById('finalDeckResults');
+    const finalDeckTableBody = document.getElementById('finalDeckTableBody');
+
+    deckResults.innerHTML = data.html;
+
+    const finalDeck = data.final_deck;
+    if (Array.isArray(finalDeck)) {
+        finalDeck.forEach(card => {
+            const row = document.createElement('tr');
+            row.innerHTML = `
+                <td>
+                    <img src="${card.image_url}" alt="${card.name}" style="width: 50px; height: auto;" data-card-image>
+                    <div class="card-zoom">
+                        <img src="${card.image_url}" alt="${card.name}">
+                    </div>
+                </td>
+                <td>${card.final_count}</td>
+                <td>${card.name}</td>
+            `;
+            finalDeckTableBody.appendChild(row);
+        });
+        finalDeckResults.classList.remove('hidden');
+        initializeImageZoom();
+    } else {
+        deckResults.innerHTML = `<p>Error: Final deck data is not in the expected format.</p>`;
+    }
+}
+
 function showFormattedDeck() {
     // Create modal container
     const modal = document.createElement('div');